@@ -3,6 +3,9 @@ from __future__ import annotations
 import hashlib
 import os
 import secrets
+import threading
+import time
+from collections import OrderedDict
 from typing import Optional
 
 from fastapi import Header, HTTPException, status
@@ -16,6 +19,53 @@ def hash_token(token: str) -> str:
     return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
 
+class TokenCache:
+    """
+    Bounded LRU cache from worker token hash to worker_id, with a TTL on each entry.
+
+    Only successful lookups are cached. Entries for a worker are dropped with `invalidate_worker()`
+    when the worker changes or disappears; the TTL bounds staleness for changes made behind our back.
+    """
+
+    def __init__(self, *, max_size: int = 10_000, ttl_seconds: float = 300.0) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token_hash: str) -> str | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is None:
+                return None
+            worker_id, expires = entry
+            if expires <= now:
+                del self._entries[token_hash]
+                return None
+            self._entries.move_to_end(token_hash)
+            return worker_id
+
+    def put(self, token_hash: str, worker_id: str) -> None:
+        with self._lock:
+            self._entries[token_hash] = (worker_id, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_worker(self, worker_id: str) -> None:
+        with self._lock:
+            for token_hash in [h for h, (w, _) in self._entries.items() if w == worker_id]:
+                del self._entries[token_hash]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
 def get_admin_token() -> str:
     return os.environ.get("OWP_ADMIN_TOKEN", "dev-admin")
 
@@ -0,0 +1 @@
+"""Benchmarks for the scheduler and API (not imported by the server)."""
@@ -0,0 +1,349 @@
+"""
+End-to-end API benchmark, in process over ASGI.
+
+Builds `create_app(PoolService(...))` on a temporary SQLite database and drives it
+through `httpx.ASGITransport` (no sockets, no uvicorn), running the app's own
+lifespan so the scheduler thread and event feed are live. A traffic mix decides
+how many simulated workers heartbeat, poll and report status, how many admins
+bulk-add tasks and how many dashboards refresh. Every client runs closed-loop
+for `--duration` seconds; the report gives per-endpoint throughput and
+p50/p95/p99 latency as JSON.
+
+    python -m pool.bench.api --mix mixed --duration 10 -o run.json
+    python -m pool.bench.api --mix workers --threshold "GET /v1/work:p95=20" --baseline run.json
+
+Exits 1 if a `--threshold` is exceeded or a percentile regressed more than
+`--max-regression` against `--baseline`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any
+
+import httpx
+
+from ..auth import get_admin_token
+from ..scheduler import SchedulerConfig
+from ..server import PoolService, create_app
+
+
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass(frozen=True)
+class TrafficMix:
+    workers: int = 200
+    # Relative weights of what a worker does next; "status" advances one of its leases.
+    worker_ops: dict[str, float] = field(
+        default_factory=lambda: {"heartbeat": 3.0, "work": 3.0, "sync": 2.0, "status": 1.0}
+    )
+    admins: int = 0  # clients alternating a bulk task add and an admin state read
+    batch_size: int = 100
+    dashboards: int = 0  # clients refreshing the dashboard with If-None-Match
+    repos: int = 10
+    backlog: int = 2000  # ready tasks created before the clock starts
+    think_seconds: float = 0.0  # pause between a client's requests
+
+
+MIXES: dict[str, TrafficMix] = {
+    "workers": TrafficMix(),
+    "mixed": TrafficMix(admins=2, dashboards=4),
+    "dashboard": TrafficMix(workers=20, dashboards=16),
+}
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def add(self, label: str, seconds: float, status_code: int) -> None:
+        self.latencies.setdefault(label, []).append(seconds)
+        if status_code >= 400:
+            self.errors[label] = self.errors.get(label, 0) + 1
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    # Nearest-rank percentile.
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict[str, dict[str, Any]]:
+    out = {}
+    for label, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        row: dict[str, Any] = {
+            "count": len(values),
+            "errors": recorder.errors.get(label, 0),
+            "rps": round(len(values) / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        for pct in PERCENTILES:
+            row[f"p{pct}_ms"] = round(_percentile(values, pct) * 1000, 3)
+        row["max_ms"] = round(values[-1] * 1000, 3)
+        out[label] = row
+    return out
+
+
+class _Client:
+    def __init__(self, http: httpx.AsyncClient, recorder: Recorder) -> None:
+        self.http = http
+        self.recorder = recorder
+
+    async def request(self, method: str, path: str, label: str | None = None, **kwargs: Any) -> httpx.Response:
+        started = time.perf_counter()
+        resp = await self.http.request(method, path, **kwargs)
+        self.recorder.add(label or f"{method} {path}", time.perf_counter() - started, resp.status_code)
+        return resp
+
+
+_NEXT_STATUS = {"leased": "in_progress", "in_progress": "pr_opened", "pr_opened": "merged"}
+
+
+async def _worker_loop(client: _Client, token: str, mix: TrafficMix, rng: random.Random, deadline: float) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    ops, weights = list(mix.worker_ops), list(mix.worker_ops.values())
+    leases: dict[str, str] = {}  # task_id -> status the worker last reported
+
+    def absorb(body: dict[str, Any]) -> None:
+        for lease in body.get("leases", ()):
+            leases.setdefault(lease["task_id"], "leased")
+
+    while time.perf_counter() < deadline:
+        op = rng.choices(ops, weights)[0]
+        if op == "status" and leases:
+            task_id = rng.choice(list(leases))
+            new_status = _NEXT_STATUS[leases[task_id]]
+            await client.request(
+                "POST", f"/v1/tasks/{task_id}/status", "POST /v1/tasks/{task_id}/status", headers=headers, json={"status": new_status}
+            )
+            if new_status == "merged":
+                del leases[task_id]
+            else:
+                leases[task_id] = new_status
+        elif op == "heartbeat":
+            await client.request("POST", "/v1/workers/heartbeat", headers=headers, json={"status": "working" if leases else "idle"})
+        elif op == "sync":
+            resp = await client.request("POST", "/v1/workers/sync", headers=headers, json={"status": "idle"})
+            if resp.status_code == 200:
+                absorb(resp.json())
+        else:
+            resp = await client.request("GET", "/v1/work", headers=headers)
+            if resp.status_code == 200:
+                absorb(resp.json())
+        if mix.think_seconds:
+            await asyncio.sleep(mix.think_seconds)
+
+
+async def _admin_loop(client: _Client, mix: TrafficMix, rng: random.Random, deadline: float) -> None:
+    headers = {"X-Admin-Token": get_admin_token()}
+    n = 0
+    while time.perf_counter() < deadline:
+        tasks = [_task(rng, mix, f"bench {n}-{i}") for i in range(mix.batch_size)]
+        await client.request("POST", "/v1/admin/tasks:batch", headers=headers, json={"tasks": tasks})
+        await client.request("GET", "/v1/admin/state", headers=headers)
+        n += 1
+        if mix.think_seconds:
+            await asyncio.sleep(mix.think_seconds)
+
+
+async def _dashboard_loop(client: _Client, mix: TrafficMix, rng: random.Random, deadline: float) -> None:
+    etags: dict[int, str] = {}
+    while time.perf_counter() < deadline:
+        page = rng.choice((1, 1, 1, 2, 3))
+        headers = {"If-None-Match": etags[page]} if page in etags else {}
+        resp = await client.request("GET", f"/?tasks_page={page}", "GET /", headers=headers)
+        if "etag" in resp.headers:
+            etags[page] = resp.headers["etag"]
+        if mix.think_seconds:
+            await asyncio.sleep(mix.think_seconds)
+
+
+def _task(rng: random.Random, mix: TrafficMix, title: str) -> dict[str, Any]:
+    return {
+        "repo": f"repo-{rng.randrange(mix.repos)}",
+        "title": title,
+        "estimate_points": rng.choice((1, 1, 2, 2, 3, 5)),
+        "priority": rng.randrange(100),
+        "required_skills": rng.choice(([], [], ["python"], ["docs"])),
+        "area": rng.choice((None, None, None, "api", "ui", "db")),
+    }
+
+
+async def _setup(client: _Client, mix: TrafficMix, rng: random.Random) -> list[str]:
+    admin = {"X-Admin-Token": get_admin_token()}
+    for i in range(mix.repos):
+        await client.request("POST", "/v1/admin/repos", headers=admin, json={"repo": f"repo-{i}", "max_open_prs": 50})
+    for start in range(0, mix.backlog, 1000):
+        tasks = [_task(rng, mix, f"backlog {i}") for i in range(start, min(mix.backlog, start + 1000))]
+        await client.request("POST", "/v1/admin/tasks:batch", headers=admin, json={"tasks": tasks})
+
+    async def register(i: int) -> str:
+        body = {
+            "name": f"bench-{i}",
+            "skills": ["python", "docs"] if i % 3 == 0 else ["python"],
+            "capacity_points": rng.randint(3, 8),
+            "max_concurrent_tasks": rng.randint(1, 3),
+        }
+        resp = await client.request("POST", "/v1/workers/register", json=body)
+        resp.raise_for_status()
+        return resp.json()["token"]
+
+    return list(await asyncio.gather(*(register(i) for i in range(mix.workers))))
+
+
+async def run(mix: TrafficMix, *, duration: float, seed: int = 1, cycle_seconds: float = 1.0) -> dict[str, Any]:
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        service = PoolService(os.path.join(tmp, "bench.db"), scheduler_config=SchedulerConfig(), cycle_seconds=cycle_seconds)
+        app = create_app(service)
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+                tokens = await _setup(_Client(http, Recorder()), mix, rng)
+
+                recorder = Recorder()
+                client = _Client(http, recorder)
+                started = time.perf_counter()
+                deadline = started + duration
+                loops = [_worker_loop(client, t, mix, random.Random(rng.random()), deadline) for t in tokens]
+                loops += [_admin_loop(client, mix, random.Random(rng.random()), deadline) for _ in range(mix.admins)]
+                loops += [_dashboard_loop(client, mix, random.Random(rng.random()), deadline) for _ in range(mix.dashboards)]
+                await asyncio.gather(*loops)
+                elapsed = time.perf_counter() - started
+
+    endpoints = summarize(recorder, elapsed)
+    total = sum(r["count"] for r in endpoints.values())
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "requests": total,
+        "rps": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def parse_threshold(spec: str) -> tuple[str, str, float]:
+    """"GET /v1/work:p95=20" -> ("GET /v1/work", "p95_ms", 20.0)."""
+    try:
+        label, rest = spec.rsplit(":", 1)
+        metric, value = rest.split("=", 1)
+        metric = metric.strip().lower()
+        if metric not in {f"p{p}" for p in PERCENTILES}:
+            raise ValueError
+        return label.strip(), f"{metric}_ms", float(value)
+    except ValueError:
+        raise ValueError(f"Invalid threshold {spec!r}; expected 'METHOD PATH:p95=MS'") from None
+
+
+def check(
+    endpoints: dict[str, dict[str, Any]],
+    *,
+    thresholds: list[tuple[str, str, float]],
+    baseline: dict[str, dict[str, Any]] | None,
+    max_regression: float,
+    min_samples: int = 20,
+) -> list[str]:
+    """Human-readable failures for absolute thresholds and regressions against a baseline run."""
+    failures = []
+    for label, metric, limit in thresholds:
+        row = endpoints.get(label)
+        if row is None:
+            failures.append(f"{label}: no requests recorded")
+        elif row[metric] > limit:
+            failures.append(f"{label}: {metric} {row[metric]} ms > {limit} ms")
+    for label, row in endpoints.items():
+        if row["errors"]:
+            failures.append(f"{label}: {row['errors']} error responses")
+    if baseline is not None:
+        for label, row in endpoints.items():
+            base = baseline.get(label)
+            if base is None or row["count"] < min_samples or base["count"] < min_samples:
+                continue
+            for pct in PERCENTILES:
+                metric = f"p{pct}_ms"
+                if base[metric] > 0 and row[metric] > base[metric] * (1 + max_regression / 100):
+                    change = (row[metric] / base[metric] - 1) * 100
+                    failures.append(f"{label}: {metric} {row[metric]} ms vs {base[metric]} ms ({change:+.0f}%)")
+    return failures
+
+
+def _print_table(report: dict[str, Any], out=sys.stderr) -> None:
+    print(f"{'endpoint':<36} {'count':>7} {'err':>5} {'rps':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8}", file=out)
+    for label, r in report["endpoints"].items():
+        print(
+            f"{label:<36} {r['count']:>7} {r['errors']:>5} {r['rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}",
+            file=out,
+        )
+    print(f"{'total':<36} {report['requests']:>7} {'':>5} {report['rps']:>8}", file=out)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m pool.bench.api")
+    parser.add_argument("--mix", default="mixed", choices=sorted(MIXES))
+    parser.add_argument("--workers", type=int, help="Override the mix's worker count")
+    parser.add_argument("--duration", default=10.0, type=float, help="Seconds of measured traffic")
+    parser.add_argument("--seed", default=1, type=int)
+    parser.add_argument("--cycle", default=1.0, type=float, help="Scheduler cycle seconds")
+    parser.add_argument("--output", "-o", help="Write JSON results here (default: stdout)")
+    parser.add_argument(
+        "--threshold",
+        action="append",
+        default=[],
+        metavar="'METHOD PATH:pNN=MS'",
+        help="Fail if an endpoint's percentile exceeds MS (repeatable)",
+    )
+    parser.add_argument("--baseline", help="Earlier JSON output; fail on percentile regressions against it")
+    parser.add_argument("--max-regression", default=25.0, type=float, help="Allowed percent regression vs --baseline")
+    args = parser.parse_args()
+
+    try:
+        thresholds = [parse_threshold(t) for t in args.threshold]
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    mix = MIXES[args.mix]
+    if args.workers is not None:
+        mix = replace(mix, workers=args.workers)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["endpoints"]
+
+    result = asyncio.run(run(mix, duration=args.duration, seed=args.seed, cycle_seconds=args.cycle))
+    report = {
+        "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "platform": platform.platform()},
+        "mix": {"name": args.mix, **asdict(mix)},
+        **result,
+    }
+    _print_table(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    failures = check(report["endpoints"], thresholds=thresholds, baseline=baseline, max_regression=args.max_regression)
+    if failures:
+        for failure in failures:
+            print(f"FAIL {failure}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Scheduling-cycle query benchmark.
+
+Builds throwaway pools with a growing number of workers and repos, runs one
+scheduling cycle on each, and reports how many SQL statements the cycle issued.
+The read side of a cycle should stay flat as the pool grows; only leases add
+statements.
+
+    python -m pool.bench.cycle --workers 10,100,1000,5000 --repos 10 --tasks 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+from .. import db
+from ..scheduler import SchedulerConfig, run_scheduling_cycle
+
+
+def _populate(conn: sqlite3.Connection, *, workers: int, repos: int, tasks: int) -> None:
+    now = db.utc_now()
+    for i in range(repos):
+        db.upsert_repo(conn, repo=f"repo-{i}", max_open_prs=100, area_locks_enabled=True)
+    for i in range(workers):
+        db.insert_worker(
+            conn,
+            worker_id=f"w_{i:06d}",
+            name=f"worker-{i}",
+            github_handle=None,
+            skills=["python"] if i % 2 else ["python", "docs"],
+            capacity_points=5,
+            max_concurrent_tasks=2,
+            status="idle",
+            token_hash=uuid.uuid4().hex,
+        )
+    heartbeat = now - timedelta(seconds=5)
+    conn.execute("UPDATE workers SET last_heartbeat=?, last_heartbeat_ms=?", (db.to_iso(heartbeat), db.to_ms(heartbeat)))
+    for i in range(tasks):
+        db.insert_task(
+            conn,
+            task_id=f"t_{i:06d}",
+            repo=f"repo-{i % repos}",
+            title=f"task {i}",
+            description=None,
+            estimate_points=1 + i % 3,
+            priority=i % 50,
+            required_skills=["docs"] if i % 5 == 0 else [],
+            area=f"area-{i % 7}" if i % 4 == 0 else None,
+            tier=0,
+        )
+    conn.commit()
+
+
+def measure_cycle(*, workers: int, repos: int, tasks: int) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = db.connect(os.path.join(tmp, "bench.db"))
+        try:
+            db.init_db(conn)
+            _populate(conn, workers=workers, repos=repos, tasks=tasks)
+
+            statements: list[str] = []
+            conn.set_trace_callback(statements.append)
+            started = time.perf_counter()
+            result = run_scheduling_cycle(conn, config=SchedulerConfig())
+            elapsed = time.perf_counter() - started
+            conn.set_trace_callback(None)
+        finally:
+            conn.close()
+
+    reads = sum(1 for s in statements if s.lstrip().upper().startswith("SELECT"))
+    return {
+        "workers": workers,
+        "repos": repos,
+        "tasks": tasks,
+        "assigned": result["assigned"],
+        "statements": len(statements),
+        "select_statements": reads,
+        "cycle_ms": round(elapsed * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m pool.bench.cycle")
+    parser.add_argument("--workers", default="10,100,1000", help="Comma-separated worker counts")
+    parser.add_argument("--repos", default=10, type=int)
+    parser.add_argument("--tasks", default=200, type=int)
+    args = parser.parse_args()
+
+    header = f"{'workers':>8} {'repos':>6} {'tasks':>6} {'assigned':>9} {'selects':>8} {'stmts':>7} {'cycle_ms':>10}"
+    print(header)
+    for n in [int(x) for x in args.workers.split(",") if x.strip()]:
+        r = measure_cycle(workers=n, repos=args.repos, tasks=args.tasks)
+        print(
+            f"{r['workers']:>8} {r['repos']:>6} {r['tasks']:>6} {r['assigned']:>9} "
+            f"{r['select_statements']:>8} {r['statements']:>7} {r['cycle_ms']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Deterministic synthetic pools for benchmarks.
+
+`generate_pool(conn, spec)` fills an initialised database with repos, workers and
+tasks drawn from `random.Random(spec.seed)`, so the same spec always yields the
+same pool and scheduler changes can be compared run against run.
+"""
+
+from __future__ import annotations
+
+import random
+import sqlite3
+from dataclasses import dataclass
+from datetime import timedelta
+
+from .. import db
+
+
+SKILLS = ("python", "docs", "typescript", "go", "rust", "sql", "infra", "frontend", "security", "ml")
+
+
+@dataclass(frozen=True)
+class PoolSpec:
+    tasks: int = 1000
+    workers: int = 100
+    repos: int = 20
+    seed: int = 1
+    # Workers
+    offline_ratio: float = 0.2  # heartbeat older than the scheduler's heartbeat TTL
+    paused_ratio: float = 0.05
+    capacity_points: tuple[int, int] = (3, 10)
+    max_concurrent_tasks: tuple[int, int] = (1, 3)
+    # Tasks
+    max_open_prs: int = 5
+    areas_per_repo: int = 8
+    area_ratio: float = 0.3  # tasks that carry an area lock
+    skilled_ratio: float = 0.6  # tasks that require at least one skill
+    active_ratio: float = 0.05  # tasks already leased or in progress
+    throttled_repo_ratio: float = 0.25  # repos already at max_open_prs
+    merged_ratio: float = 0.05
+
+    def label(self) -> str:
+        return f"{self.tasks}t/{self.workers}w/{self.repos}r"
+
+
+def _pick_skills(rng: random.Random, k_max: int) -> list[str]:
+    # Skewed towards the first skills, so some are common and some are scarce.
+    k = rng.randint(1, k_max)
+    weights = [1.0 / (i + 1) for i in range(len(SKILLS))]
+    chosen: set[str] = set()
+    while len(chosen) < k:
+        chosen.add(rng.choices(SKILLS, weights)[0])
+    return sorted(chosen)
+
+
+def generate_pool(conn: sqlite3.Connection, spec: PoolSpec, *, heartbeat_ttl_seconds: int = 90) -> None:
+    """Populates `conn` (already passed through `db.init_db`) and commits."""
+    rng = random.Random(spec.seed)
+    now = db.utc_now()
+
+    repos = [f"repo-{i:04d}" for i in range(spec.repos)]
+    for repo in repos:
+        db.upsert_repo(conn, repo=repo, max_open_prs=spec.max_open_prs, area_locks_enabled=rng.random() < 0.8)
+
+    worker_ids = [f"w_{i:06d}" for i in range(spec.workers)]
+    heartbeats = []
+    for worker_id in worker_ids:
+        paused = rng.random() < spec.paused_ratio
+        db.insert_worker(
+            conn,
+            worker_id=worker_id,
+            name=worker_id,
+            github_handle=None,
+            skills=_pick_skills(rng, 4),
+            capacity_points=rng.randint(*spec.capacity_points),
+            max_concurrent_tasks=rng.randint(*spec.max_concurrent_tasks),
+            status="paused" if paused else "idle",
+            token_hash=f"bench-{spec.seed}-{worker_id}",
+        )
+        if rng.random() < spec.offline_ratio:
+            age = heartbeat_ttl_seconds + rng.uniform(1, 24 * 3600)
+        else:
+            age = rng.uniform(0, heartbeat_ttl_seconds * 0.8)
+        at = now - timedelta(seconds=age)
+        heartbeats.append((db.to_iso(at), db.to_ms(at), worker_id))
+    conn.executemany("UPDATE workers SET last_heartbeat=?, last_heartbeat_ms=? WHERE worker_id=?", heartbeats)
+
+    tasks = []
+    for i in range(spec.tasks):
+        repo = rng.choice(repos)
+        tasks.append(
+            {
+                "task_id": f"t_{i:07d}",
+                "repo": repo,
+                "title": f"task {i}",
+                "description": None,
+                "estimate_points": rng.choices((1, 2, 3, 4, 5), (30, 30, 20, 12, 8))[0],
+                "priority": int(rng.paretovariate(1.5) * 10) % 100,
+                "required_skills": _pick_skills(rng, 2) if rng.random() < spec.skilled_ratio else [],
+                "area": f"area-{rng.randrange(spec.areas_per_repo)}" if rng.random() < spec.area_ratio else None,
+                "tier": rng.randint(0, 2),
+            }
+        )
+    db.insert_tasks(conn, tasks)
+
+    # Move a slice of the backlog into the other states so load, throttles and locks start non-empty.
+    lease_expires = now + timedelta(minutes=30)
+    active, other = [], []
+    by_repo: dict[str, list[str]] = {}
+    for task in tasks:
+        r = rng.random()
+        if r < spec.active_ratio and worker_ids:
+            status = rng.choice(("leased", "in_progress"))
+            active.append((status, rng.choice(worker_ids), db.to_iso(lease_expires), db.to_ms(lease_expires), task["task_id"]))
+        elif r < spec.active_ratio + spec.merged_ratio:
+            other.append(("merged", task["task_id"]))
+        else:
+            by_repo.setdefault(task["repo"], []).append(task["task_id"])
+    for repo in repos:
+        ready = by_repo.get(repo, [])
+        n_open = spec.max_open_prs if rng.random() < spec.throttled_repo_ratio else rng.randrange(spec.max_open_prs)
+        other.extend(("pr_opened", task_id) for task_id in ready[:n_open])
+    conn.executemany(
+        "UPDATE tasks SET status=?, assigned_worker_id=?, lease_expires_at=?, lease_expires_ms=? WHERE task_id=?",
+        active,
+    )
+    conn.executemany("UPDATE tasks SET status=? WHERE task_id=?", other)
+    conn.commit()
@@ -0,0 +1,146 @@
+"""
+Query-plan check for the hot queries in `pool.db`.
+
+Runs every hot db helper against a small populated database, captures the SQL it
+issues (with parameters bound), and prints `EXPLAIN QUERY PLAN` for each
+statement. Exits non-zero if any statement full-scans a table, so it can gate CI:
+
+    python -m pool.bench.plans
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+from typing import Callable
+
+from .. import db
+from .cycle import _populate
+
+
+# Tables whose full scan counts as a regression; CTEs and subquery results are bounded by their own plans.
+BASE_TABLES = frozenset({"repos", "workers", "tasks", "events", "status_counts", "repo_status_counts"})
+
+# Hot query name -> tables it may scan on purpose: whole-table reads the scheduler snapshot needs, the
+# counter tables (one row per status or per repo and status), and index-ordered scans under a small LIMIT.
+ALLOWED_SCANS: dict[str, frozenset[str]] = {
+    "counts_by_status": frozenset({"status_counts"}),
+    "counts_by_repo": frozenset({"repo_status_counts"}),
+    "load_scheduler_snapshot": frozenset({"repos", "workers", "repo_status_counts"}),
+    "dashboard_repos": frozenset({"repos"}),
+    "dashboard_workers": frozenset({"workers"}),
+    "dashboard_workers_online": frozenset({"workers"}),
+    "dashboard_tasks": frozenset({"tasks"}),
+    "dashboard_events": frozenset({"events"}),
+}
+
+
+def _hot_queries() -> list[tuple[str, Callable[[sqlite3.Connection], object]]]:
+    now_ms = db.to_ms(db.utc_now())
+    since_ms = now_ms - 90_000
+    return [
+        ("worker_by_token_hash", lambda c: db.worker_by_token_hash(c, "h")),
+        ("worker_by_id", lambda c: db.worker_by_id(c, "w_000001")),
+        ("list_tasks_for_worker", lambda c: db.list_tasks_for_worker(c, "w_000001")),
+        ("worker_load", lambda c: db.worker_load(c, "w_000001")),
+        ("list_ready_tasks", db.list_ready_tasks),
+        ("locked_areas", lambda c: db.locked_areas(c, "repo-1")),
+        ("count_open_prs", lambda c: db.count_open_prs(c, "repo-1")),
+        ("counts_by_status", db.counts_by_status),
+        ("counts_by_repo", db.counts_by_repo),
+        ("count_online_workers", lambda c: db.count_online_workers(c, since_ms=since_ms)),
+        ("next_lease_expiry", db.next_lease_expiry),
+        ("requeue_expired_leases", db.requeue_expired_leases),
+        ("load_scheduler_snapshot", db.load_scheduler_snapshot),
+        ("events_by_task", lambda c: db.list_events(c, task_id="t_000001")),
+        ("events_by_repo", lambda c: db.list_events(c, repo="repo-1")),
+        ("events_after", lambda c: db.list_events(c, after_id=10, upto_id=100)),
+        ("event_types", db.event_types),
+        ("expired_events", lambda c: db.expired_events(c, event_type="worker.heartbeat", before_ms=now_ms, limit=100)),
+        ("dashboard_repos", lambda c: db.dashboard_repos(c, repo=None, limit=51, offset=0)),
+        ("dashboard_workers", lambda c: db.dashboard_workers(c, online_since_ms=since_ms, online=None, limit=51, offset=0)),
+        ("dashboard_workers_online", lambda c: db.dashboard_workers(c, online_since_ms=since_ms, online=True, limit=51, offset=0)),
+        ("dashboard_tasks", lambda c: db.dashboard_tasks(c, repo=None, status=None, limit=51, offset=0)),
+        ("dashboard_tasks_status", lambda c: db.dashboard_tasks(c, repo=None, status="leased", limit=51, offset=0)),
+        ("dashboard_tasks_repo_status", lambda c: db.dashboard_tasks(c, repo="repo-1", status="leased", limit=51, offset=0)),
+        ("dashboard_events", lambda c: db.dashboard_events(c, repo=None, before_id=None, limit=51)),
+        ("dashboard_events_repo", lambda c: db.dashboard_events(c, repo="repo-1", before_id=None, limit=51)),
+    ]
+
+
+def _statements(conn: sqlite3.Connection, fn: Callable[[sqlite3.Connection], object]) -> list[str]:
+    statements: list[str] = []
+    conn.set_trace_callback(statements.append)
+    try:
+        fn(conn)
+    finally:
+        conn.set_trace_callback(None)
+        conn.rollback()
+    keep = ("SELECT", "UPDATE", "DELETE", "WITH")
+    return [s for s in statements if s.lstrip().upper().startswith(keep)]
+
+
+def _partial_indexes(conn: sqlite3.Connection) -> set[str]:
+    rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+    return {r["name"] for r in rows if " WHERE " in r["sql"].upper()}
+
+
+def _full_scans(plan: list[sqlite3.Row], allowed: frozenset[str], partial: set[str]) -> list[str]:
+    bad = []
+    for row in plan:
+        detail = str(row["detail"])
+        words = detail.split()
+        # "SCAN <table> [USING INDEX i]" reads the whole table or index; SEARCH is a seek. Walking a
+        # partial index only visits the rows its WHERE admits (ready tasks, active leases).
+        if len(words) < 2 or words[0] != "SCAN" or words[1] not in BASE_TABLES or words[1] in allowed:
+            continue
+        if "INDEX" in words and words[-1] in partial:
+            continue
+        bad.append(detail)
+    return bad
+
+
+def check_plans(conn: sqlite3.Connection, *, verbose: bool = False) -> list[tuple[str, str, str]]:
+    """Returns (query name, statement, plan detail) for every full table scan among the hot queries."""
+    failures = []
+    partial = _partial_indexes(conn)
+    for name, fn in _hot_queries():
+        for sql in _statements(conn, fn):
+            plan = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+            if verbose:
+                print(f"-- {name}")
+                for row in plan:
+                    print(f"   {row['detail']}")
+            for detail in _full_scans(plan, ALLOWED_SCANS.get(name, frozenset()), partial):
+                failures.append((name, " ".join(sql.split()), detail))
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m pool.bench.plans")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Print every plan")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = db.connect(os.path.join(tmp, "plans.db"))
+        try:
+            db.init_db(conn)
+            _populate(conn, workers=50, repos=5, tasks=200)
+            db.log_event(conn, event_type="worker.heartbeat", actor_worker_id="w_000001")
+            conn.commit()
+            failures = check_plans(conn, verbose=args.verbose)
+        finally:
+            conn.close()
+
+    if failures:
+        for name, sql, detail in failures:
+            print(f"FULL SCAN in {name}: {detail}\n    {sql}")
+        sys.exit(1)
+    print("ok: no hot query full-scans a table")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Scheduling-cycle benchmark over synthetic pools.
+
+For every (tasks, workers) combination, generates a deterministic pool (see
+`pool.bench.generate`), then runs one cold scheduling cycle (state loaded from
+the database, as after a restart) on fresh copies of it and records wall time,
+SQL statements issued, peak Python memory and assignments made. Results are
+written as JSON so runs before and after a scheduler change can be compared:
+
+    python -m pool.bench.scheduler --tasks 1000,10000,100000 --workers 100,1000,10000 --output after.json
+    python -m pool.bench.scheduler --baseline before.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, replace
+from typing import Any
+
+from .. import db
+from ..scheduler import ASSIGNMENT_ENGINES, SchedulerConfig, run_scheduling_cycle
+from .generate import PoolSpec, generate_pool
+
+
+def _copy(template: sqlite3.Connection) -> sqlite3.Connection:
+    conn = db.connect(":memory:")
+    template.backup(conn)
+    return conn
+
+
+def _run_once(template: sqlite3.Connection, config: SchedulerConfig, *, trace_memory: bool) -> dict[str, Any]:
+    conn = _copy(template)
+    try:
+        statements = 0
+
+        def count(_sql: str) -> None:
+            nonlocal statements
+            statements += 1
+
+        conn.set_trace_callback(count)
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        result = run_scheduling_cycle(conn, config=config)
+        conn.commit()
+        elapsed = time.perf_counter() - started
+        peak = 0
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        conn.set_trace_callback(None)
+    finally:
+        conn.close()
+    return {"seconds": elapsed, "statements": statements, "peak_bytes": peak, "result": result}
+
+
+def measure(spec: PoolSpec, *, config: SchedulerConfig, repeat: int = 3) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        template = db.connect(os.path.join(tmp, "template.db"))
+        try:
+            db.init_db(template)
+            started = time.perf_counter()
+            generate_pool(template, spec, heartbeat_ttl_seconds=config.heartbeat_ttl_seconds)
+            generate_seconds = time.perf_counter() - started
+
+            runs = [_run_once(template, config, trace_memory=False) for _ in range(max(1, repeat))]
+            # Memory is traced in a separate run: tracemalloc slows allocation-heavy code down severalfold.
+            memory = _run_once(template, config, trace_memory=True)
+        finally:
+            template.close()
+
+    times = [r["seconds"] * 1000 for r in runs]
+    result = runs[0]["result"]
+    return {
+        "spec": asdict(spec),
+        "label": spec.label(),
+        "generate_ms": round(generate_seconds * 1000, 1),
+        "cycle_ms_min": round(min(times), 2),
+        "cycle_ms_median": round(statistics.median(times), 2),
+        "statements": runs[0]["statements"],
+        "peak_memory_bytes": memory["peak_bytes"],
+        "assigned": result["assigned"],
+        "result": result,
+    }
+
+
+def _environment() -> dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def _print_table(results: list[dict[str, Any]], baseline: dict[str, dict[str, Any]] | None, out=sys.stderr) -> None:
+    header = f"{'pool':>22} {'assigned':>9} {'stmts':>7} {'peak_MiB':>9} {'cycle_ms':>10}"
+    if baseline is not None:
+        header += f" {'base_ms':>10} {'change':>8}"
+    print(header, file=out)
+    for r in results:
+        line = (
+            f"{r['label']:>22} {r['assigned']:>9} {r['statements']:>7} "
+            f"{r['peak_memory_bytes'] / 2**20:>9.1f} {r['cycle_ms_median']:>10}"
+        )
+        if baseline is not None:
+            base = baseline.get(r["label"])
+            if base is None:
+                line += f" {'-':>10} {'-':>8}"
+            else:
+                change = (r["cycle_ms_median"] / base["cycle_ms_median"] - 1) * 100 if base["cycle_ms_median"] else 0.0
+                line += f" {base['cycle_ms_median']:>10} {change:>+7.1f}%"
+        print(line, file=out)
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(x) for x in value.split(",") if x.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m pool.bench.scheduler")
+    parser.add_argument("--tasks", default="1000,10000", help="Comma-separated task counts")
+    parser.add_argument("--workers", default="100,1000", help="Comma-separated worker counts")
+    parser.add_argument("--repos", default=20, type=int)
+    parser.add_argument("--seed", default=1, type=int)
+    parser.add_argument("--repeat", default=3, type=int, help="Timed cycles per pool (median is reported)")
+    parser.add_argument("--assignment", default="greedy", choices=ASSIGNMENT_ENGINES)
+    parser.add_argument("--matching-budget-ms", default=500, type=int)
+    parser.add_argument("--output", "-o", help="Write JSON results here (default: stdout)")
+    parser.add_argument("--baseline", help="Earlier JSON output to compare cycle times against")
+    args = parser.parse_args()
+
+    config = SchedulerConfig(assignment=args.assignment, matching_budget_ms=args.matching_budget_ms)
+    base_spec = PoolSpec(repos=args.repos, seed=args.seed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = {r["label"]: r for r in json.load(f)["results"]}
+
+    results = []
+    for tasks in _int_list(args.tasks):
+        for workers in _int_list(args.workers):
+            results.append(measure(replace(base_spec, tasks=tasks, workers=workers), config=config, repeat=args.repeat))
+
+    _print_table(results, baseline)
+    report = {"environment": _environment(), "scheduler_config": asdict(config), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import os
 import re
+import signal
 import time
 from typing import Any
 
@@ -9,10 +12,12 @@ import httpx
 import typer
 import yaml
 from rich.console import Console
+from rich.live import Live
 from rich.table import Table
 
 from .config import config_path, load_config, save_config
 from .envfile import load_env
+from .swarm import SwarmConfig, SwarmStats, percentile, run_swarm
 
 
 app = typer.Typer(help="OWP Pool CLI (worker + admin)")
@@ -72,6 +77,17 @@ def _die_for_status(resp: httpx.Response) -> None:
     raise typer.Exit(code=1)
 
 
+def _post_tasks(base: str, headers: dict[str, str], bodies: list[dict[str, Any]], *, chunk_size: int) -> int:
+    """Creates tasks through the batch endpoint, `chunk_size` per request, over one connection."""
+    created = 0
+    with httpx.Client(timeout=60.0) as client:
+        for i in range(0, len(bodies), chunk_size):
+            resp = client.post(f"{base}/v1/admin/tasks:batch", json={"tasks": bodies[i : i + chunk_size]}, headers=headers)
+            _die_for_status(resp)
+            created += len(resp.json()["task_ids"])
+    return created
+
+
 @worker_app.command("register")
 def worker_register(
     name: str = typer.Option(..., "--name"),
@@ -111,54 +127,74 @@ def worker_run(
     server: str | None = typer.Option(None, "--server"),
     token: str | None = typer.Option(None, "--token", help="Bearer token (optional if saved)"),
     heartbeat_every: int = typer.Option(10, "--heartbeat-every", help="Seconds"),
-    poll_every: int = typer.Option(10, "--poll-every", help="Seconds"),
+    poll_every: int = typer.Option(10, "--poll-every", help="Seconds (only used with --no-long-poll)"),
+    long_poll: bool = typer.Option(True, "--long-poll/--no-long-poll", help="Wait on the server for lease changes between heartbeats"),
 ) -> None:
     base = _server_url(server)
     tok = _worker_token(token)
 
     headers = {"Authorization": f"Bearer {tok}"}
-    last_poll = 0.0
-    last_heartbeat = 0.0
+    # Each sync is both a heartbeat and a poll. Between syncs, long-poll for lease changes instead of
+    # re-polling on a timer, so new leases show up as soon as the scheduler assigns them.
+    sync_every = heartbeat_every if long_poll else min(heartbeat_every, poll_every)
+    last_sync = 0.0
+    version: int | None = None
 
     console.print(f"Worker loop started. Server={base}")
     while True:
         now = time.time()
-        if now - last_heartbeat >= heartbeat_every:
-            resp = _request("POST", f"{base}/v1/workers/heartbeat", json_body={"status": "working"}, headers=headers)
-            _die_for_status(resp)
-            last_heartbeat = now
-
-        if now - last_poll >= poll_every:
-            resp = _request("GET", f"{base}/v1/work", headers=headers)
+        leases = None
+        if now - last_sync >= sync_every:
+            resp = _request("POST", f"{base}/v1/workers/sync", json_body={"status": "working"}, headers=headers)
             _die_for_status(resp)
             data = resp.json()
             leases = data.get("leases", [])
-
-            table = Table(title="Assigned Leases")
-            table.add_column("task_id", style="cyan")
-            table.add_column("repo")
-            table.add_column("points", justify="right")
-            table.add_column("priority", justify="right")
-            table.add_column("area")
-            table.add_column("skills")
-            table.add_column("expires")
-            table.add_column("title")
-
-            for l in leases:
-                table.add_row(
-                    l["task_id"],
-                    l["repo"],
-                    str(l["estimate_points"]),
-                    str(l["priority"]),
-                    l.get("area") or "",
-                    ",".join(l.get("required_skills") or []),
-                    l["lease_expires_at"],
-                    (l.get("title") or "")[:60],
-                )
-            console.print(table)
-            last_poll = now
-
-        time.sleep(1)
+            version = data.get("version")
+            last_sync = now
+        elif long_poll and version is not None:
+            wait = max(1, min(60, int(sync_every - (now - last_sync))))
+            resp = _request(
+                "GET",
+                f"{base}/v1/work",
+                params={"wait": wait, "since": version},
+                headers=headers,
+                timeout=wait + 20.0,
+            )
+            _die_for_status(resp)
+            data = resp.json()
+            if data.get("version") != version:
+                leases = data.get("leases", [])
+                version = data.get("version")
+        else:
+            time.sleep(1)
+
+        if leases is not None:
+            _print_leases(leases)
+
+
+def _print_leases(leases: list[dict[str, Any]]) -> None:
+    table = Table(title="Assigned Leases")
+    table.add_column("task_id", style="cyan")
+    table.add_column("repo")
+    table.add_column("points", justify="right")
+    table.add_column("priority", justify="right")
+    table.add_column("area")
+    table.add_column("skills")
+    table.add_column("expires")
+    table.add_column("title")
+
+    for l in leases:
+        table.add_row(
+            l["task_id"],
+            l["repo"],
+            str(l["estimate_points"]),
+            str(l["priority"]),
+            l.get("area") or "",
+            ",".join(l.get("required_skills") or []),
+            l["lease_expires_at"],
+            (l.get("title") or "")[:60],
+        )
+    console.print(table)
 
 
 @worker_app.command("simulate")
@@ -207,19 +243,21 @@ def worker_simulate(
     headers = {"Authorization": f"Bearer {tok}"}
 
     processed: set[str] = set()
-    last_poll = 0.0
-    last_heartbeat = 0.0
+    sync_every = min(heartbeat_every, poll_every)
+    last_sync = 0.0
 
     console.print(f"Sim worker loop started. Server={base} once={once}")
     while True:
         now = time.time()
-        if now - last_heartbeat >= heartbeat_every:
-            resp = _request("POST", f"{base}/v1/workers/heartbeat", json_body={"status": "working"}, headers=headers)
-            _die_for_status(resp)
-            last_heartbeat = now
-
-        if now - last_poll >= poll_every:
-            resp = _request("GET", f"{base}/v1/work", headers=headers)
+        if now - last_sync >= sync_every:
+            # Wait briefly for the cycle our heartbeat triggers, so fresh leases come back in this sync.
+            resp = _request(
+                "POST",
+                f"{base}/v1/workers/sync",
+                json_body={"status": "working"},
+                params={"cycle_wait": 2},
+                headers=headers,
+            )
             _die_for_status(resp)
             data = resp.json()
             leases = data.get("leases", [])
@@ -260,7 +298,7 @@ def worker_simulate(
 
                 processed.add(task_id)
 
-            last_poll = now
+            last_sync = now
             if once and not leases:
                 break
 
@@ -272,6 +310,102 @@ def worker_simulate(
     console.print("[green]Sim worker done[/green]")
 
 
+@worker_app.command("swarm")
+def worker_swarm(
+    server: str | None = typer.Option(None, "--server"),
+    count: int = typer.Option(100, "--count", min=1, help="Simulated workers"),
+    skills: str = typer.Option("", "--skills", help="Comma-separated skill tags for every worker"),
+    capacity: int = typer.Option(5, "--capacity", min=1),
+    max_concurrent: int = typer.Option(2, "--max-concurrent", min=1),
+    heartbeat_every: float = typer.Option(10.0, "--heartbeat-every", help="Seconds between syncs (jittered ±50%)"),
+    long_poll: bool = typer.Option(True, "--long-poll/--no-long-poll", help="Long-poll for lease changes between syncs"),
+    poll_every: float = typer.Option(3.0, "--poll-every", help="Seconds (only used with --no-long-poll)"),
+    start_delay: float = typer.Option(1.0, "--start-delay", help="Seconds from lease to in_progress"),
+    open_delay: float = typer.Option(5.0, "--open-delay", help="Seconds from in_progress to pr_opened"),
+    merge_delay: float = typer.Option(5.0, "--merge-delay", help="Seconds from pr_opened to merged"),
+    merge_ratio: float = typer.Option(1.0, "--merge-ratio", min=0.0, max=1.0, help="Share of opened PRs that get merged"),
+    fail_ratio: float = typer.Option(0.0, "--fail-ratio", min=0.0, max=1.0, help="Share of tasks reported blocked"),
+    offline_ratio: float = typer.Option(0.0, "--offline-ratio", min=0.0, max=1.0, help="Chance per sync that a worker goes silent"),
+    offline_for: float = typer.Option(120.0, "--offline-for", help="Seconds a silent worker stays away"),
+    duration: float = typer.Option(0.0, "--duration", help="Seconds to run (0 = until Ctrl-C)"),
+    seed: int | None = typer.Option(None, "--seed"),
+) -> None:
+    """
+    Load generator: registers COUNT workers and drives their sync/poll/status lifecycle concurrently.
+
+    All workers share one event loop and one HTTP client; a live table shows per-operation throughput
+    and latency. Registered workers are not saved to the local config.
+    """
+    base = _server_url(server)
+    config = SwarmConfig(
+        count=count,
+        skills=tuple(s.strip() for s in skills.split(",") if s.strip()),
+        capacity_points=capacity,
+        max_concurrent_tasks=max_concurrent,
+        heartbeat_every=heartbeat_every,
+        long_poll=long_poll,
+        poll_every=poll_every,
+        start_delay=start_delay,
+        open_delay=open_delay,
+        merge_delay=merge_delay,
+        merge_ratio=merge_ratio,
+        fail_ratio=fail_ratio,
+        offline_ratio=offline_ratio,
+        offline_seconds=offline_for,
+        seed=seed,
+    )
+
+    async def main() -> SwarmStats:
+        stop = asyncio.Event()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGINT, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: Ctrl-C raises KeyboardInterrupt instead
+        with Live(console=console, refresh_per_second=2) as live:
+            return await run_swarm(
+                base,
+                config,
+                duration=duration or None,
+                on_tick=lambda stats: live.update(_swarm_table(stats)),
+                stop=stop,
+            )
+
+    console.print(f"Swarm of {count} workers against {base}. Ctrl-C to stop.")
+    stats = asyncio.run(main())
+    elapsed = time.perf_counter() - stats.started
+    total = sum(stats.totals.values())
+    errors = sum(stats.errors.values())
+    console.print(
+        f"[green]Done[/green] {total} requests in {elapsed:.0f}s ({total / max(elapsed, 1e-9):.0f}/s), {errors} errors; "
+        + ", ".join(f"{k}={v}" for k, v in stats.counters.items())
+    )
+
+
+def _swarm_table(stats: SwarmStats) -> Table:
+    elapsed, window = stats.window()
+    counters = ", ".join(f"{k}={v}" for k, v in stats.counters.items())
+    table = Table(title=f"Swarm ({time.perf_counter() - stats.started:.0f}s) {counters}")
+    table.add_column("op", style="cyan")
+    table.add_column("req/s", justify="right")
+    table.add_column("p50 ms", justify="right")
+    table.add_column("p95 ms", justify="right")
+    table.add_column("p99 ms", justify="right")
+    table.add_column("total", justify="right")
+    table.add_column("errors", justify="right")
+    for op in sorted(stats.totals):
+        samples = window.get(op, [])
+        table.add_row(
+            op,
+            f"{len(samples) / elapsed:.0f}" if elapsed > 0 else "0",
+            f"{percentile(samples, 50) * 1000:.1f}",
+            f"{percentile(samples, 95) * 1000:.1f}",
+            f"{percentile(samples, 99) * 1000:.1f}",
+            str(stats.totals[op]),
+            str(stats.errors.get(op, 0)),
+        )
+    return table
+
+
 @worker_app.command("status")
 def worker_status_update(
     task_id: str = typer.Argument(...),
@@ -347,6 +481,7 @@ def admin_import_tasks(
     path: str = typer.Argument(...),
     repo: str = typer.Option(..., "--repo"),
     server: str | None = typer.Option(None, "--server"),
+    chunk_size: int = typer.Option(500, "--chunk-size", min=1, max=5000, help="Tasks per batch request"),
 ) -> None:
     base = _server_url(server)
     headers = {"X-Admin-Token": _admin_token()}
@@ -354,7 +489,7 @@ def admin_import_tasks(
     if not isinstance(tasks, list):
         raise typer.BadParameter("Expected YAML list of tasks")
 
-    created = 0
+    bodies = []
     for t in tasks:
         body = {
             "repo": repo,
@@ -366,10 +501,9 @@ def admin_import_tasks(
             "area": t.get("area"),
             "tier": int(t.get("tier", 0)),
         }
-        resp = _request("POST", f"{base}/v1/admin/tasks", json_body=body, headers=headers)
-        _die_for_status(resp)
-        created += 1
+        bodies.append(body)
 
+    created = _post_tasks(base, headers, bodies, chunk_size=chunk_size)
     console.print(f"[green]Imported[/green] {created} tasks into repo {repo}")
 
 
@@ -411,6 +545,7 @@ def admin_import_github_issues(
     server: str | None = typer.Option(None, "--server"),
     github_token: str | None = typer.Option(None, "--github-token", envvar="GITHUB_TOKEN"),
     limit: int = typer.Option(50, "--limit", min=1, max=200),
+    chunk_size: int = typer.Option(500, "--chunk-size", min=1, max=5000, help="Tasks per batch request"),
 ) -> None:
     """
     Imports GitHub issues (open) into the scheduler as tasks.
@@ -451,7 +586,7 @@ def admin_import_github_issues(
         console.print(f"[red]Unexpected GitHub response[/red]: {issues}")
         raise typer.Exit(code=1)
 
-    created = 0
+    bodies = []
     for it in issues[:limit]:
         # Skip PRs returned in issues list
         if isinstance(it, dict) and it.get("pull_request"):
@@ -485,10 +620,9 @@ def admin_import_github_issues(
             "area": area_val,
             "tier": 0,
         }
-        resp2 = _request("POST", f"{base}/v1/admin/tasks", json_body=body, headers=headers)
-        _die_for_status(resp2)
-        created += 1
+        bodies.append(body)
 
+    created = _post_tasks(base, headers, bodies, chunk_size=chunk_size)
     console.print(f"[green]Imported[/green] {created} GitHub issues into repo {repo}")
 
 
@@ -511,3 +645,40 @@ def admin_state(server: str | None = typer.Option(None, "--server")) -> None:
     ]:
         table.add_row(k, str(data.get(k, "")))
     console.print(table)
+
+
+@admin_app.command("watch")
+def admin_watch(
+    server: str | None = typer.Option(None, "--server"),
+    types: str = typer.Option("", "--types", help="Comma-separated event types (default: all)"),
+    repo: str | None = typer.Option(None, "--repo"),
+    task_id: str | None = typer.Option(None, "--task"),
+    actor: str | None = typer.Option(None, "--actor", help="Actor worker_id"),
+    since: int | None = typer.Option(None, "--since", help="Replay events after this id first"),
+) -> None:
+    """
+    Streams pool events (SSE) until interrupted, reconnecting from the last seen id.
+    """
+    base = _server_url(server)
+    params: dict[str, Any] = {"type": [t.strip() for t in types.split(",") if t.strip()]}
+    for key, value in (("repo", repo), ("task_id", task_id), ("actor", actor), ("last_event_id", since)):
+        if value is not None:
+            params[key] = value
+
+    while True:
+        try:
+            with httpx.stream("GET", f"{base}/v1/events", params=params, timeout=httpx.Timeout(30.0, read=None)) as resp:
+                if resp.status_code >= 400:
+                    resp.read()
+                    _die_for_status(resp)
+                for line in resp.iter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    e = json.loads(line[6:])
+                    params["last_event_id"] = e["id"]
+                    who = e.get("actor_worker_id") or ""
+                    what = e.get("task_id") or e.get("repo") or ""
+                    console.print(f"[dim]{e['id']} {e['ts']}[/dim] [cyan]{e['type']}[/cyan] {who} {what}")
+        except httpx.TransportError as exc:
+            console.print(f"[yellow]Disconnected[/yellow] ({exc}); reconnecting…")
+            time.sleep(2)
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import asdict, dataclass, field, replace
+from datetime import timedelta
+from typing import Any, Iterator
+from urllib.parse import urlencode
+
+from jinja2 import Environment, PackageLoader, select_autoescape
+
+from . import db
+
+
+STATUSES = ("ready", "leased", "in_progress", "blocked", "pr_opened", "merged")
+
+# Compiled once per process; rendering only runs the generated code.
+_env = Environment(loader=PackageLoader("pool", "templates"), autoescape=select_autoescape(["html"]))
+_template = _env.get_template("dashboard.html")
+
+
+@dataclass(frozen=True)
+class DashboardQuery:
+    """Filters and page positions for one dashboard view (all sections share `page_size`)."""
+
+    repo: str | None = None
+    status: str | None = None
+    online: bool | None = None
+    repos_page: int = 1
+    workers_page: int = 1
+    tasks_page: int = 1
+    events_before: int | None = None
+    page_size: int = 50
+
+    def params(self, **changes: Any) -> dict[str, Any]:
+        """Non-default query-string parameters for this view with `changes` applied."""
+        values = asdict(replace(self, **changes))
+        defaults = asdict(DashboardQuery())
+        out = {}
+        for k, v in values.items():
+            if v == defaults[k]:
+                continue
+            out[k] = ("yes" if v else "no") if k == "online" else v
+        return out
+
+
+@dataclass
+class DashboardData:
+    query: DashboardQuery
+    counts: dict[str, int]
+    repos: list[dict[str, Any]]
+    workers: list[dict[str, Any]]
+    tasks: list[dict[str, Any]]
+    events: list[dict[str, Any]]
+    more: dict[str, bool] = field(default_factory=dict)
+
+
+def _page(rows: list[sqlite3.Row], limit: int) -> tuple[list[dict[str, Any]], bool]:
+    return [dict(r) for r in rows[:limit]], len(rows) > limit
+
+
+def load_dashboard(conn: sqlite3.Connection, query: DashboardQuery, *, heartbeat_ttl_seconds: int) -> DashboardData:
+    """Gathers one dashboard view: a fixed number of queries, each bounded by the page size."""
+    n = query.page_size
+    online_since_ms = db.to_ms(db.utc_now() - timedelta(seconds=heartbeat_ttl_seconds))
+
+    repos, repos_more = _page(
+        db.dashboard_repos(conn, repo=query.repo, limit=n + 1, offset=(query.repos_page - 1) * n), n
+    )
+    workers, workers_more = _page(
+        db.dashboard_workers(
+            conn, online_since_ms=online_since_ms, online=query.online, limit=n + 1, offset=(query.workers_page - 1) * n
+        ),
+        n,
+    )
+    for w in workers:
+        w["skills"] = db.json_loads(w["skills_json"]) or []
+        w["online"] = bool(w["online"])
+    tasks, tasks_more = _page(
+        db.dashboard_tasks(conn, repo=query.repo, status=query.status, limit=n + 1, offset=(query.tasks_page - 1) * n),
+        n,
+    )
+    for t in tasks:
+        art = db.json_loads(t["artifact_json"]) or {}
+        t["artifact"] = art.get("pr_url") or art.get("commit_sha") or ""
+    events, events_more = _page(db.dashboard_events(conn, repo=query.repo, before_id=query.events_before, limit=n + 1), n)
+
+    return DashboardData(
+        query=query,
+        counts=db.counts_by_status(conn),
+        repos=repos,
+        workers=workers,
+        tasks=tasks,
+        events=events,
+        more={"repos": repos_more, "workers": workers_more, "tasks": tasks_more, "events": events_more},
+    )
+
+
+def render(data: DashboardData, *, etag: str | None = None, chunk_size: int = 16384) -> Iterator[str]:
+    """Streams the page in chunks of about `chunk_size` characters; `etag` seeds the page's refetches."""
+    buf: list[str] = []
+    size = 0
+    for piece in _generate(data, etag):
+        buf.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def _generate(data: DashboardData, etag: str | None) -> Iterator[str]:
+    q = data.query
+    events_params = {"repo": q.repo} if q.repo else {}
+    return _template.generate(
+        q=q,
+        now=db.to_iso(db.utc_now()),
+        statuses=STATUSES,
+        counts=data.counts,
+        repos=data.repos,
+        workers=data.workers,
+        tasks=data.tasks,
+        events=data.events,
+        repos_more=data.more["repos"],
+        workers_more=data.more["workers"],
+        tasks_more=data.more["tasks"],
+        events_more=data.more["events"],
+        page_size=q.page_size,
+        etag=etag,
+        events_url="/v1/events" + ("?" + urlencode(events_params) if events_params else ""),
+        link=lambda **changes: "/?" + urlencode(q.params(**changes)),
+    )
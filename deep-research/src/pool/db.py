@@ -1,11 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
+import queue
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
 
 
 def utc_now() -> datetime:
@@ -20,6 +32,19 @@ def to_iso(dt: datetime | None) -> str | None:
     return dt.astimezone(timezone.utc).isoformat()
 
 
+def to_ms(dt: datetime) -> int:
+    """Epoch milliseconds (naive datetimes are taken as UTC)."""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def from_ms(value: int | None) -> datetime | None:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+
+
 def from_iso(value: str | None) -> datetime | None:
     if value is None:
         return None
@@ -36,14 +61,333 @@ def json_loads(value: str | None) -> Any:
     return json.loads(value)
 
 
-def connect(db_path: str) -> sqlite3.Connection:
+def connect(db_path: str, *, cached_statements: int = 128) -> sqlite3.Connection:
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path, check_same_thread=False)
+    return _open(db_path, cached_statements=cached_statements)
+
+
+class PoolConnection(sqlite3.Connection):
+    # Set on the pool's writer connection; log_event buffers into it instead of inserting directly.
+    events: "EventWriter | None" = None
+
+
+def _open(db_path: str, *, cached_statements: int) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=cached_statements, factory=PoolConnection)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
     return conn
 
 
+EVENT_DURABILITY_MODES = ("transaction", "deferred")
+
+
+class EventWriter:
+    """
+    Buffers event rows and writes them with a single executemany inside the writer's transaction.
+
+    Durability modes:
+    - "transaction": every event commits together with the state change it describes.
+    - "deferred": events logged with `deferrable=True` (heartbeats) may wait up to `flush_interval`
+      seconds and ride along with a later write transaction; a crash can lose that window of telemetry.
+    """
+
+    def __init__(self, *, durability: str = "transaction", flush_interval: float = 1.0) -> None:
+        if durability not in EVENT_DURABILITY_MODES:
+            raise ValueError(f"Unknown event durability mode: {durability}")
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self._rows: list[tuple[Any, ...]] = []
+        self._deferred: list[tuple[Any, ...]] = []
+        self._last_flush = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._rows) + len(self._deferred)
+
+    def add(self, row: tuple[Any, ...], *, deferrable: bool = False) -> None:
+        if deferrable and self.durability == "deferred":
+            self._deferred.append(row)
+        else:
+            self._rows.append(row)
+
+    def mark(self) -> tuple[int, int]:
+        return len(self._rows), len(self._deferred)
+
+    def discard(self, mark: tuple[int, int]) -> None:
+        """Drops events added since `mark` (their transaction rolled back)."""
+        del self._rows[mark[0]:]
+        del self._deferred[mark[1]:]
+
+    def flush(self, conn: sqlite3.Connection, *, force: bool = False) -> int:
+        rows, self._rows = self._rows, []
+        if self._deferred and (force or time.monotonic() - self._last_flush >= self.flush_interval):
+            rows = self._deferred + rows
+            self._deferred = []
+            self._last_flush = time.monotonic()
+        if rows:
+            conn.executemany(_INSERT_EVENT, rows)
+        return len(rows)
+
+
+class ConnectionPool:
+    """
+    Long-lived SQLite connections for a WAL-mode database: one writer, many readers.
+
+    - `writer()` hands out the single writer connection under a lock, so every mutation goes through
+      one serialized path. The block's work is committed when it exits (rolled back if it raises).
+    - `reader()` hands out this thread's own connection inside a read transaction, so the queries in
+      the block see one consistent snapshot and never wait for the writer.
+    - `data_version` increases after each committed writer block that changed rows, so readers can
+      cache derived views without asking SQLite whether anything changed.
+
+    Pragmas are applied once per connection at open, and each connection keeps its own prepared-statement
+    cache (`cached_statements`). `close()` closes everything the pool opened; later calls reopen lazily.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        cached_statements: int = 256,
+        synchronous: str = "NORMAL",
+        busy_timeout_ms: int = 5000,
+        event_durability: str = "transaction",
+        event_flush_interval: float = 1.0,
+    ) -> None:
+        self.db_path = db_path
+        self.events = EventWriter(durability=event_durability, flush_interval=event_flush_interval)
+        self.cached_statements = cached_statements
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self.write_lock = threading.RLock()
+        # Called (on the writer thread, after the commit) when a writer block wrote events.
+        self.event_listeners: list[Callable[[], None]] = []
+        # Called (on the writer thread, lock held) when a writer block's commit failed and was rolled
+        # back, so anything that mirrored its writes in memory can resync.
+        self.rollback_listeners: list[Callable[[], None]] = []
+        # Bumped after every committed writer block that changed rows; cheap cache key for readers.
+        self.data_version = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conns: list[sqlite3.Connection] = []
+        self._writer: sqlite3.Connection | None = None
+        self._generation = 0
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+    def _open(self) -> sqlite3.Connection:
+        conn = _open(self.db_path, cached_statements=self.cached_statements)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)};")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous};")
+        with self._lock:
+            self._conns.append(conn)
+        return conn
+
+    def _get_reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and getattr(self._local, "generation", None) == self._generation:
+            return conn
+        conn = self._open()
+        self._local.conn = conn
+        self._local.generation = self._generation
+        return conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        with self.write_lock:
+            if self._writer is None:
+                self._writer = self._open()
+                self._writer.execute("PRAGMA journal_mode = WAL;")
+                self._writer.events = self.events
+            conn = self._writer
+            mark = self.events.mark()
+            changes = conn.total_changes
+            try:
+                yield conn
+            except BaseException:
+                self.events.discard(mark)
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            try:
+                flushed = self.events.flush(conn)
+                if conn.in_transaction:
+                    conn.commit()
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                for listener in self.rollback_listeners:
+                    listener()
+                raise
+            if conn.total_changes != changes:
+                self.data_version += 1
+            if flushed:
+                for listener in self.event_listeners:
+                    listener()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        conn = self._get_reader()
+        if conn.in_transaction:
+            # Nested use on the same thread: share the outer snapshot.
+            yield conn
+            return
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+
+    def close(self) -> None:
+        with self.write_lock:
+            if len(self.events):
+                with self.writer() as conn:
+                    self.events.flush(conn, force=True)
+                for listener in self.event_listeners:
+                    listener()
+            with self._lock:
+                conns, self._conns = self._conns, []
+                self._writer = None
+                self._generation += 1
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+class AsyncDB:
+    """
+    Awaitable access to a ConnectionPool for async request handlers.
+
+    `write(fn, *args)` queues `fn(conn, *args)` for one dedicated writer thread and awaits its result
+    (resolved after the commit), so a request waiting its turn for the writer parks a future rather
+    than a threadpool thread. Jobs that pile up while the thread is busy run back to back in one
+    transaction, each inside its own savepoint: a burst of heartbeats shares one commit, and a job
+    that raises rolls back alone and re-raises in its caller.
+
+    `read(fn, *args)` runs `fn(conn, *args)` inside a reader snapshot on a small pool of dedicated
+    threads, independent of the server's request threadpool.
+
+    Until `start()` (and after `stop()`) both run inline on the calling thread.
+    """
+
+    def __init__(self, pool: ConnectionPool, *, readers: int = 4, max_batch: int = 128) -> None:
+        self.pool = pool
+        self.readers = readers
+        self.max_batch = max_batch
+        self._jobs: queue.SimpleQueue[Any] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._read_executor: ThreadPoolExecutor | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._read_executor = ThreadPoolExecutor(max_workers=self.readers, thread_name_prefix="pool-db-read")
+        self._thread = threading.Thread(target=self._loop, name="pool-db-write", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._jobs.put(None)
+            thread.join(timeout)
+            # Jobs that raced the shutdown still get run.
+            leftover = []
+            while True:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    leftover.append(job)
+            if leftover:
+                self._run_batch(leftover)
+        executor, self._read_executor = self._read_executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    async def write(self, fn: Callable[..., T], *args: Any) -> T:
+        if not self.running:
+            with self.pool.writer() as conn:
+                return fn(conn, *args)
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future[T] = loop.create_future()
+        self._jobs.put((fn, args, loop, fut))
+        return await fut
+
+    async def read(self, fn: Callable[..., T], *args: Any) -> T:
+        def job() -> T:
+            with self.pool.reader() as conn:
+                return fn(conn, *args)
+
+        executor = self._read_executor
+        if executor is None:
+            return job()
+        return await asyncio.wrap_future(executor.submit(job))
+
+    def _loop(self) -> None:
+        while True:
+            first = self._jobs.get()
+            if first is None:
+                return
+            batch = [first]
+            stopping = False
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            self._run_batch(batch)
+            if stopping:
+                return
+
+    def _run_batch(self, batch: list[Any]) -> None:
+        outcomes: list[tuple[Any, BaseException | None]] = []
+        try:
+            with self.pool.writer() as conn:
+                if not conn.in_transaction:
+                    conn.execute("BEGIN")
+                for fn, args, _, _ in batch:
+                    mark = self.pool.events.mark()
+                    conn.execute("SAVEPOINT job")
+                    try:
+                        result = fn(conn, *args)
+                    except Exception as exc:
+                        conn.execute("ROLLBACK TO job")
+                        conn.execute("RELEASE job")
+                        self.pool.events.discard(mark)
+                        outcomes.append((None, exc))
+                    else:
+                        conn.execute("RELEASE job")
+                        outcomes.append((result, None))
+        except Exception as exc:
+            # The commit itself failed: nothing in the batch was written (the pool's rollback
+            # listeners have already been told).
+            logger.exception("write batch failed")
+            outcomes = [(None, exc)] * len(batch)
+        for (_, _, loop, fut), (result, exc) in zip(batch, outcomes):
+            try:
+                loop.call_soon_threadsafe(_settle, fut, result, exc)
+            except RuntimeError:
+                pass  # the caller's event loop is already closed
+
+
+def _settle(fut: asyncio.Future[Any], result: Any, exc: BaseException | None) -> None:
+    if fut.done():
+        return
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
+
+
 def init_db(conn: sqlite3.Connection) -> None:
     conn.executescript(
         """
@@ -65,7 +409,8 @@ def init_db(conn: sqlite3.Connection) -> None:
           last_heartbeat TEXT,
           token_hash TEXT NOT NULL,
           reputation REAL NOT NULL DEFAULT 0.0,
-          created_at TEXT NOT NULL
+          created_at TEXT NOT NULL,
+          last_heartbeat_ms INTEGER
         );
 
         CREATE TABLE IF NOT EXISTS tasks (
@@ -86,12 +431,13 @@ def init_db(conn: sqlite3.Connection) -> None:
           message TEXT,
           artifact_json TEXT,
           attempt INTEGER NOT NULL DEFAULT 0,
+          lease_expires_ms INTEGER,
+          updated_ms INTEGER,
           FOREIGN KEY(repo) REFERENCES repos(repo) ON DELETE CASCADE,
           FOREIGN KEY(assigned_worker_id) REFERENCES workers(worker_id) ON DELETE SET NULL
         );
 
-        CREATE INDEX IF NOT EXISTS idx_tasks_repo_status ON tasks(repo, status);
-        CREATE INDEX IF NOT EXISTS idx_tasks_status_priority ON tasks(status, priority);
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_workers_token_hash ON workers(token_hash);
 
         CREATE TABLE IF NOT EXISTS events (
           id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -101,13 +447,209 @@ def init_db(conn: sqlite3.Connection) -> None:
           repo TEXT,
           task_id TEXT,
           details_json TEXT,
+          ts_ms INTEGER,
           FOREIGN KEY(actor_worker_id) REFERENCES workers(worker_id) ON DELETE SET NULL
         );
+
+        CREATE TABLE IF NOT EXISTS schema_version (
+          version INTEGER NOT NULL
+        );
         """
     )
+    _migrate(conn)
     conn.commit()
 
 
+def schema_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return int(row[0] or 0)
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """
+    Applies every migration newer than the recorded schema version, in order.
+
+    Each step runs in its own transaction together with its version bump, so a crash leaves the
+    database at the last completed version and the next start resumes from there.
+    """
+    current = schema_version(conn)
+    for version, step in _MIGRATIONS:
+        if version <= current:
+            continue
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            step(conn)
+            conn.execute("DELETE FROM schema_version")
+            conn.execute("INSERT INTO schema_version(version) VALUES (?)", (version,))
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        logger.info("applied schema migration %d (%s)", version, step.__name__)
+        current = version
+
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> bool:
+    """Adds a column to a table created by an older version; True if it was missing."""
+    if any(r["name"] == column for r in conn.execute(f"PRAGMA table_info({table})")):
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    return True
+
+
+def _iso_to_ms(column: str) -> str:
+    """SQL expression converting an ISO-8601 TEXT column to epoch milliseconds."""
+    return f"CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def _migration_1_heartbeat_ms_and_counters(conn: sqlite3.Connection) -> None:
+    if _add_column(conn, "workers", "last_heartbeat_ms", "INTEGER"):
+        conn.execute(
+            f"UPDATE workers SET last_heartbeat_ms = {_iso_to_ms('last_heartbeat')} WHERE last_heartbeat IS NOT NULL"
+        )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_workers_heartbeat_ms ON workers(last_heartbeat_ms)")
+    _init_counters(conn)
+
+
+def _migration_2_epoch_ms(conn: sqlite3.Connection) -> None:
+    # Numeric twins of the ISO columns that are range-scanned or sorted; the ISO columns stay for the API.
+    _add_column(conn, "tasks", "lease_expires_ms", "INTEGER")
+    _add_column(conn, "tasks", "updated_ms", "INTEGER")
+    _add_column(conn, "events", "ts_ms", "INTEGER")
+    conn.execute(
+        f"UPDATE tasks SET lease_expires_ms = {_iso_to_ms('lease_expires_at')} "
+        "WHERE lease_expires_at IS NOT NULL AND lease_expires_ms IS NULL"
+    )
+    conn.execute(f"UPDATE tasks SET updated_ms = {_iso_to_ms('updated_at')} WHERE updated_ms IS NULL")
+    conn.execute(f"UPDATE events SET ts_ms = {_iso_to_ms('ts')} WHERE ts_ms IS NULL")
+
+    conn.execute("DROP INDEX IF EXISTS idx_tasks_active_lease")
+    conn.execute("DROP INDEX IF EXISTS idx_tasks_updated_at")
+    conn.execute("DROP INDEX IF EXISTS idx_events_type_ts")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_active_lease_ms ON tasks(lease_expires_ms) "
+        "WHERE status IN ('leased','in_progress')"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_updated_ms ON tasks(updated_ms)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_type_ts_ms ON events(type, ts_ms)")
+
+
+def _migration_3_hot_query_indexes(conn: sqlite3.Connection) -> None:
+    # Shaped after EXPLAIN QUERY PLAN of the hot queries (`python -m pool.bench.plans` checks them).
+    # Partial indexes cover only the rows a query can match: ready tasks in scheduling order, and
+    # active leases for per-worker load and per-repo area locks.
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_ready_order ON tasks(priority DESC, estimate_points, task_id) "
+        "WHERE status = 'ready'"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_active_load ON tasks(assigned_worker_id, estimate_points) "
+        "WHERE status IN ('leased','in_progress')"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_active_area ON tasks(repo, area) WHERE status IN ('leased','in_progress')"
+    )
+    # Dashboard task pages filter by status and/or repo and sort by recency.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status_updated_ms ON tasks(status, updated_ms)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_repo_status_updated_ms ON tasks(repo, status, updated_ms)")
+    conn.execute("DROP INDEX IF EXISTS idx_tasks_repo_status")
+    conn.execute("DROP INDEX IF EXISTS idx_tasks_status_priority")
+    # Event stream filters and the dashboard's per-repo feed.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_task_id ON events(task_id, id) WHERE task_id IS NOT NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_events_repo_id ON events(repo, id) WHERE repo IS NOT NULL")
+
+
+def _migration_4_worker_indexes(conn: sqlite3.Connection) -> None:
+    # Worker listings (admin state, dashboard pages) sort by registration time.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_workers_created_at ON workers(created_at)")
+    # A full (assignee, status) index was maintained on every task write although idx_tasks_active_load
+    # serves the load queries; the lease list also needs blocked and pr_opened, so it gets a partial
+    # index over exactly the statuses a worker holds.
+    conn.execute("DROP INDEX IF EXISTS idx_tasks_assignee_status")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_worker_held ON tasks(assigned_worker_id) "
+        "WHERE status IN ('leased','in_progress','blocked','pr_opened')"
+    )
+
+
+# Task counts per status and per (repo, status), kept current by triggers in the same transaction as
+# the task write, so admin state and the dashboard read a handful of rows instead of scanning tasks.
+_COUNTER_SCHEMA = (
+    """
+CREATE TABLE IF NOT EXISTS status_counts (
+  status TEXT PRIMARY KEY,
+  n INTEGER NOT NULL
+) WITHOUT ROWID
+    """,
+    """
+CREATE TABLE IF NOT EXISTS repo_status_counts (
+  repo TEXT NOT NULL,
+  status TEXT NOT NULL,
+  n INTEGER NOT NULL,
+  PRIMARY KEY(repo, status)
+) WITHOUT ROWID
+    """,
+    """
+CREATE TRIGGER IF NOT EXISTS trg_tasks_count_insert AFTER INSERT ON tasks BEGIN
+  INSERT INTO status_counts(status, n) VALUES (NEW.status, 1)
+    ON CONFLICT(status) DO UPDATE SET n = n + 1;
+  INSERT INTO repo_status_counts(repo, status, n) VALUES (NEW.repo, NEW.status, 1)
+    ON CONFLICT(repo, status) DO UPDATE SET n = n + 1;
+END
+    """,
+    """
+CREATE TRIGGER IF NOT EXISTS trg_tasks_count_delete AFTER DELETE ON tasks BEGIN
+  UPDATE status_counts SET n = n - 1 WHERE status = OLD.status;
+  UPDATE repo_status_counts SET n = n - 1 WHERE repo = OLD.repo AND status = OLD.status;
+END
+    """,
+    """
+CREATE TRIGGER IF NOT EXISTS trg_tasks_count_update AFTER UPDATE OF status, repo ON tasks
+WHEN OLD.status IS NOT NEW.status OR OLD.repo IS NOT NEW.repo BEGIN
+  UPDATE status_counts SET n = n - 1 WHERE status = OLD.status;
+  UPDATE repo_status_counts SET n = n - 1 WHERE repo = OLD.repo AND status = OLD.status;
+  INSERT INTO status_counts(status, n) VALUES (NEW.status, 1)
+    ON CONFLICT(status) DO UPDATE SET n = n + 1;
+  INSERT INTO repo_status_counts(repo, status, n) VALUES (NEW.repo, NEW.status, 1)
+    ON CONFLICT(repo, status) DO UPDATE SET n = n + 1;
+END
+    """,
+)
+
+
+def _init_counters(conn: sqlite3.Connection) -> None:
+    fresh = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='status_counts'").fetchone() is None
+    # Statement by statement (not executescript, which commits) so the migration step stays atomic.
+    for statement in _COUNTER_SCHEMA:
+        conn.execute(statement)
+    if fresh:
+        rebuild_counters(conn)
+
+
+def rebuild_counters(conn: sqlite3.Connection) -> None:
+    """Recomputes the counter tables from `tasks` (for a new schema or a suspected drift)."""
+    conn.execute("DELETE FROM status_counts")
+    conn.execute("DELETE FROM repo_status_counts")
+    conn.execute("INSERT INTO status_counts(status, n) SELECT status, COUNT(*) FROM tasks GROUP BY status")
+    conn.execute(
+        "INSERT INTO repo_status_counts(repo, status, n) SELECT repo, status, COUNT(*) FROM tasks GROUP BY repo, status"
+    )
+
+
+# (version, step). Steps must be safe to re-run: a crash before the version row is committed repeats them.
+_MIGRATIONS: list[tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, _migration_1_heartbeat_ms_and_counters),
+    (2, _migration_2_epoch_ms),
+    (3, _migration_3_hot_query_indexes),
+    (4, _migration_4_worker_indexes),
+]
+
+
+_INSERT_EVENT = "INSERT INTO events(ts,ts_ms,type,actor_worker_id,repo,task_id,details_json) VALUES (?,?,?,?,?,?,?)"
+
+
 def log_event(
     conn: sqlite3.Connection,
     *,
@@ -116,12 +658,84 @@ def log_event(
     repo: str | None = None,
     task_id: str | None = None,
     details: dict[str, Any] | None = None,
+    deferrable: bool = False,
 ) -> None:
-    conn.execute(
-        "INSERT INTO events(ts,type,actor_worker_id,repo,task_id,details_json) VALUES (?,?,?,?,?,?)",
-        (to_iso(utc_now()), event_type, actor_worker_id, repo, task_id, json_dumps(details or {})),
+    """
+    Records an event in the caller's transaction (nothing is committed here).
+
+    On a pool writer connection the row is buffered and written by the EventWriter when the writer block
+    commits; `deferrable` marks high-volume telemetry that may be held back in "deferred" durability mode.
+    """
+    now = utc_now()
+    row = (to_iso(now), to_ms(now), event_type, actor_worker_id, repo, task_id, json_dumps(details or {}))
+    events = getattr(conn, "events", None)
+    if events is not None:
+        events.add(row, deferrable=deferrable)
+    else:
+        conn.execute(_INSERT_EVENT, row)
+
+
+def last_event_id(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0])
+
+
+def list_events(
+    conn: sqlite3.Connection,
+    *,
+    after_id: int = 0,
+    upto_id: int | None = None,
+    types: Iterable[str] = (),
+    repo: str | None = None,
+    task_id: str | None = None,
+    actor_worker_id: str | None = None,
+    limit: int = 1000,
+) -> list[sqlite3.Row]:
+    """Events with `after_id < id <= upto_id` in id order, optionally filtered."""
+    where = ["id > ?"]
+    params: list[Any] = [after_id]
+    if upto_id is not None:
+        where.append("id <= ?")
+        params.append(upto_id)
+    types = list(types)
+    if types:
+        where.append(f"type IN ({','.join('?' * len(types))})")
+        params.extend(types)
+    for col, value in (("repo", repo), ("task_id", task_id), ("actor_worker_id", actor_worker_id)):
+        if value is not None:
+            where.append(f"{col} = ?")
+            params.append(value)
+    params.append(limit)
+    return conn.execute(f"SELECT * FROM events WHERE {' AND '.join(where)} ORDER BY id LIMIT ?", params).fetchall()
+
+
+def event_types(conn: sqlite3.Connection) -> list[str]:
+    # Skip-scan over idx_events_type_ts_ms: one index seek per distinct type instead of reading every event.
+    cur = conn.execute(
+        """
+        WITH RECURSIVE t(type) AS (
+          SELECT MIN(type) FROM events
+          UNION ALL
+          SELECT (SELECT MIN(type) FROM events WHERE type > t.type) FROM t WHERE t.type IS NOT NULL
+        )
+        SELECT type FROM t WHERE type IS NOT NULL
+        """
     )
-    conn.commit()
+    return [str(r[0]) for r in cur]
+
+
+def expired_events(conn: sqlite3.Connection, *, event_type: str, before_ms: int, limit: int) -> list[sqlite3.Row]:
+    """Oldest events of one type with `ts_ms < before_ms` (served by idx_events_type_ts_ms)."""
+    return conn.execute(
+        "SELECT * FROM events WHERE type = ? AND ts_ms < ? ORDER BY ts_ms, id LIMIT ?",
+        (event_type, before_ms, limit),
+    ).fetchall()
+
+
+def delete_events(conn: sqlite3.Connection, event_ids: list[int]) -> int:
+    if not event_ids:
+        return 0
+    cur = conn.execute(f"DELETE FROM events WHERE id IN ({','.join('?' * len(event_ids))})", event_ids)
+    return cur.rowcount
 
 
 def upsert_repo(conn: sqlite3.Connection, *, repo: str, max_open_prs: int, area_locks_enabled: bool) -> None:
@@ -135,7 +749,6 @@ def upsert_repo(conn: sqlite3.Connection, *, repo: str, max_open_prs: int, area_
         """,
         (repo, max_open_prs, 1 if area_locks_enabled else 0, to_iso(utc_now())),
     )
-    conn.commit()
 
 
 def repo_row(conn: sqlite3.Connection, repo: str) -> sqlite3.Row | None:
@@ -178,7 +791,6 @@ def insert_worker(
             to_iso(utc_now()),
         ),
     )
-    conn.commit()
 
 
 def worker_by_token_hash(conn: sqlite3.Connection, token_hash: str) -> sqlite3.Row | None:
@@ -198,12 +810,27 @@ def update_worker_heartbeat(
     status: str,
     note: str | None,
 ) -> None:
+    now = utc_now()
     conn.execute(
-        "UPDATE workers SET status=?, last_heartbeat=? WHERE worker_id=?",
-        (status, to_iso(utc_now()), worker_id),
+        "UPDATE workers SET status=?, last_heartbeat=?, last_heartbeat_ms=? WHERE worker_id=?",
+        (status, to_iso(now), to_ms(now), worker_id),
+    )
+    log_event(
+        conn,
+        event_type="worker.heartbeat",
+        actor_worker_id=worker_id,
+        details={"status": status, "note": note},
+        deferrable=True,
     )
-    log_event(conn, event_type="worker.heartbeat", actor_worker_id=worker_id, details={"status": status, "note": note})
-    conn.commit()
+
+
+_INSERT_TASK = """
+    INSERT INTO tasks(
+      task_id, repo, title, description, estimate_points, priority, required_skills_json, area, tier,
+      status, assigned_worker_id, leased_at, lease_expires_at, updated_at, message, artifact_json, attempt,
+      lease_expires_ms, updated_ms
+    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+"""
 
 
 def insert_task(
@@ -219,34 +846,54 @@ def insert_task(
     area: str | None,
     tier: int,
 ) -> None:
-    conn.execute(
-        """
-        INSERT INTO tasks(
-          task_id, repo, title, description, estimate_points, priority, required_skills_json, area, tier,
-          status, assigned_worker_id, leased_at, lease_expires_at, updated_at, message, artifact_json, attempt
-        ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-        """,
+    insert_tasks(
+        conn,
+        [
+            {
+                "task_id": task_id,
+                "repo": repo,
+                "title": title,
+                "description": description,
+                "estimate_points": estimate_points,
+                "priority": priority,
+                "required_skills": required_skills,
+                "area": area,
+                "tier": tier,
+            }
+        ],
+    )
+
+
+def insert_tasks(conn: sqlite3.Connection, tasks: Iterable[dict[str, Any]]) -> int:
+    """Inserts ready tasks with one executemany; each dict takes insert_task's keyword arguments."""
+    now_dt = utc_now()
+    now, now_ms = to_iso(now_dt), to_ms(now_dt)
+    rows = [
         (
-            task_id,
-            repo,
-            title,
-            description,
-            estimate_points,
-            priority,
-            json_dumps(required_skills),
-            area,
-            tier,
+            t["task_id"],
+            t["repo"],
+            t["title"],
+            t["description"],
+            t["estimate_points"],
+            t["priority"],
+            json_dumps(t["required_skills"]),
+            t["area"],
+            t["tier"],
             "ready",
             None,
             None,
             None,
-            to_iso(utc_now()),
+            now,
             None,
             None,
             0,
-        ),
-    )
-    conn.commit()
+            None,
+            now_ms,
+        )
+        for t in tasks
+    ]
+    conn.executemany(_INSERT_TASK, rows)
+    return len(rows)
 
 
 def list_tasks_for_worker(conn: sqlite3.Connection, worker_id: str) -> list[sqlite3.Row]:
@@ -271,13 +918,14 @@ def update_task_status(
     message: str | None,
     artifact: dict[str, Any] | None,
 ) -> None:
+    now = utc_now()
     conn.execute(
         """
         UPDATE tasks
-        SET status = ?, message = ?, artifact_json = ?, updated_at = ?
+        SET status = ?, message = ?, artifact_json = ?, updated_at = ?, updated_ms = ?
         WHERE task_id = ?
         """,
-        (status, message, json_dumps(artifact or {}), to_iso(utc_now()), task_id),
+        (status, message, json_dumps(artifact or {}), to_iso(now), to_ms(now), task_id),
     )
     log_event(
         conn,
@@ -286,7 +934,6 @@ def update_task_status(
         task_id=task_id,
         details={"status": status, "message": message, "artifact": artifact},
     )
-    conn.commit()
 
 
 def lease_task(
@@ -295,66 +942,113 @@ def lease_task(
     task_id: str,
     worker_id: str,
     lease_expires_at: datetime,
-) -> None:
-    conn.execute(
+) -> bool:
+    """Leases a ready task; returns False (and writes nothing) if the task is no longer ready."""
+    now = utc_now()
+    cur = conn.execute(
         """
         UPDATE tasks
-        SET status='leased', assigned_worker_id=?, leased_at=?, lease_expires_at=?, updated_at=?
-        WHERE task_id=?
+        SET status='leased', assigned_worker_id=?, leased_at=?, lease_expires_at=?, updated_at=?,
+            lease_expires_ms=?, updated_ms=?
+        WHERE task_id=? AND status='ready'
         """,
-        (worker_id, to_iso(utc_now()), to_iso(lease_expires_at), to_iso(utc_now()), task_id),
+        (worker_id, to_iso(now), to_iso(lease_expires_at), to_iso(now), to_ms(lease_expires_at), to_ms(now), task_id),
     )
+    if cur.rowcount != 1:
+        return False
     log_event(conn, event_type="task.leased", actor_worker_id=worker_id, task_id=task_id, details={"lease_expires_at": to_iso(lease_expires_at)})
-    conn.commit()
+    return True
+
+
+_REQUEUE_SET = """
+    UPDATE tasks INDEXED BY idx_tasks_active_lease_ms
+    SET status='ready',
+        assigned_worker_id=NULL,
+        leased_at=NULL,
+        lease_expires_at=NULL,
+        lease_expires_ms=NULL,
+        message='requeued (lease expired)',
+        updated_at=:now,
+        updated_ms=:now_ms,
+        attempt=attempt+1
+"""
 
+# Must contain idx_tasks_active_lease_ms's WHERE clause verbatim for the partial index to apply.
+_EXPIRED_LEASES = """
+    WHERE status IN ('leased','in_progress')
+      AND lease_expires_ms < :now_ms
+"""
 
-def requeue_expired_leases(conn: sqlite3.Connection) -> int:
+
+def requeue_expired_leases(conn: sqlite3.Connection) -> list[sqlite3.Row]:
+    """
+    Requeues every expired lease with one set-based UPDATE and logs the requeue events in bulk.
+
+    Returns the requeued tasks as they were before the update (status, assigned worker, points, area
+    and the fields a ready task needs), so callers can apply them as deltas.
+    """
     now = utc_now()
+    params = {"now": to_iso(now), "now_ms": to_ms(now)}
+    # RETURNING only sees the updated row, and the previous owner is needed: read the set first,
+    # then update the same set in one statement (the caller holds the write transaction).
+    cur = conn.execute(
+        """
+        SELECT task_id, repo, status, priority, estimate_points, required_skills_json, area, assigned_worker_id
+        FROM tasks INDEXED BY idx_tasks_active_lease_ms
+        """
+        + _EXPIRED_LEASES,
+        params,
+    )
+    rows = cur.fetchall()
+    if rows:
+        conn.execute(_REQUEUE_SET + _EXPIRED_LEASES, params)
+
+    for row in rows:
+        log_event(conn, event_type="task.requeued", task_id=row["task_id"], details={"reason": "lease_expired"})
+    return rows
+
+
+def next_lease_expiry(conn: sqlite3.Connection) -> int | None:
+    """Earliest active lease expiry in epoch ms, or None."""
     cur = conn.execute(
         """
-        SELECT task_id FROM tasks
+        SELECT MIN(lease_expires_ms) AS ms FROM tasks INDEXED BY idx_tasks_active_lease_ms
         WHERE status IN ('leased','in_progress')
-          AND lease_expires_at IS NOT NULL
-          AND lease_expires_at < ?
-        """,
-        (to_iso(now),),
+          AND lease_expires_ms IS NOT NULL
+        """
     )
-    task_ids = [r["task_id"] for r in cur.fetchall()]
-    for task_id in task_ids:
-        conn.execute(
-            """
-            UPDATE tasks
-            SET status='ready',
-                assigned_worker_id=NULL,
-                leased_at=NULL,
-                lease_expires_at=NULL,
-                message='requeued (lease expired)',
-                updated_at=?,
-                attempt=attempt+1
-            WHERE task_id=?
-            """,
-            (to_iso(utc_now()), task_id),
-        )
-        log_event(conn, event_type="task.requeued", task_id=task_id, details={"reason": "lease_expired"})
-    conn.commit()
-    return len(task_ids)
+    row = cur.fetchone()
+    return row["ms"] if row else None
 
 
 def counts_by_status(conn: sqlite3.Connection) -> dict[str, int]:
-    cur = conn.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status")
+    cur = conn.execute("SELECT status, n FROM status_counts WHERE n > 0")
     return {r["status"]: int(r["n"]) for r in cur.fetchall()}
 
 
+def counts_by_repo(conn: sqlite3.Connection) -> dict[str, dict[str, int]]:
+    counts: dict[str, dict[str, int]] = {}
+    for r in conn.execute("SELECT repo, status, n FROM repo_status_counts WHERE n > 0"):
+        counts.setdefault(r["repo"], {})[r["status"]] = int(r["n"])
+    return counts
+
+
 def count_open_prs(conn: sqlite3.Connection, repo: str) -> int:
-    cur = conn.execute("SELECT COUNT(*) AS n FROM tasks WHERE repo=? AND status='pr_opened'", (repo,))
+    cur = conn.execute("SELECT n FROM repo_status_counts WHERE repo=? AND status='pr_opened'", (repo,))
     row = cur.fetchone()
     return int(row["n"]) if row else 0
 
 
+def count_online_workers(conn: sqlite3.Connection, *, since_ms: int) -> int:
+    """Workers whose last heartbeat is at or after `since_ms` (an index range count)."""
+    cur = conn.execute("SELECT COUNT(*) FROM workers WHERE last_heartbeat_ms >= ?", (since_ms,))
+    return int(cur.fetchone()[0])
+
+
 def locked_areas(conn: sqlite3.Connection, repo: str) -> set[str]:
     cur = conn.execute(
         """
-        SELECT DISTINCT area FROM tasks
+        SELECT DISTINCT area FROM tasks INDEXED BY idx_tasks_active_area
         WHERE repo=?
           AND area IS NOT NULL
           AND area != ''
@@ -368,7 +1062,7 @@ def locked_areas(conn: sqlite3.Connection, repo: str) -> set[str]:
 def list_ready_tasks(conn: sqlite3.Connection) -> list[sqlite3.Row]:
     cur = conn.execute(
         """
-        SELECT * FROM tasks
+        SELECT * FROM tasks INDEXED BY idx_tasks_ready_order
         WHERE status='ready'
         ORDER BY priority DESC, estimate_points ASC, task_id ASC
         """
@@ -376,6 +1070,143 @@ def list_ready_tasks(conn: sqlite3.Connection) -> list[sqlite3.Row]:
     return cur.fetchall()
 
 
+@dataclass
+class SchedulerSnapshot:
+    """Everything a scheduling cycle reads, loaded with a fixed number of grouped queries."""
+
+    repos: dict[str, sqlite3.Row]
+    workers: list[sqlite3.Row]
+    worker_loads: dict[str, tuple[int, int]]
+    open_prs: dict[str, int]
+    locked_areas: dict[str, dict[str, int]]
+    ready_tasks: list[sqlite3.Row]
+
+
+def load_scheduler_snapshot(conn: sqlite3.Connection) -> SchedulerSnapshot:
+    repos = {r["repo"]: r for r in conn.execute("SELECT * FROM repos ORDER BY repo ASC").fetchall()}
+
+    cur = conn.execute(
+        """
+        SELECT
+          assigned_worker_id,
+          COALESCE(SUM(estimate_points), 0) AS pts,
+          COUNT(*) AS n
+        FROM tasks INDEXED BY idx_tasks_active_load
+        WHERE assigned_worker_id IS NOT NULL
+          AND status IN ('leased','in_progress')
+        GROUP BY assigned_worker_id
+        """
+    )
+    worker_loads = {r["assigned_worker_id"]: (int(r["pts"]), int(r["n"])) for r in cur.fetchall()}
+
+    cur = conn.execute("SELECT repo, n FROM repo_status_counts WHERE status='pr_opened' AND n > 0")
+    open_prs = {r["repo"]: int(r["n"]) for r in cur.fetchall()}
+
+    cur = conn.execute(
+        """
+        SELECT repo, area, COUNT(*) AS n FROM tasks INDEXED BY idx_tasks_active_area
+        WHERE area IS NOT NULL
+          AND area != ''
+          AND status IN ('leased','in_progress')
+        GROUP BY repo, area
+        """
+    )
+    areas: dict[str, dict[str, int]] = {}
+    for r in cur.fetchall():
+        areas.setdefault(r["repo"], {})[r["area"]] = int(r["n"])
+
+    return SchedulerSnapshot(
+        repos=repos,
+        workers=list_workers(conn),
+        worker_loads=worker_loads,
+        open_prs=open_prs,
+        locked_areas=areas,
+        ready_tasks=list_ready_tasks(conn),
+    )
+
+
+# --- dashboard pages --------------------------------------------------------------------------
+# Each returns at most `limit` rows with aggregates joined in, so a page costs the same regardless
+# of pool size. Callers ask for limit+1 rows to know whether there is a next page.
+
+
+def dashboard_repos(conn: sqlite3.Connection, *, repo: str | None, limit: int, offset: int) -> list[sqlite3.Row]:
+    return conn.execute(
+        """
+        WITH page AS (
+          SELECT * FROM repos WHERE (:repo IS NULL OR repo = :repo) ORDER BY repo LIMIT :limit OFFSET :offset
+        )
+        SELECT page.*, COALESCE(c.n, 0) AS open_prs
+        FROM page LEFT JOIN repo_status_counts c ON c.repo = page.repo AND c.status = 'pr_opened'
+        ORDER BY page.repo
+        """,
+        {"repo": repo, "limit": limit, "offset": offset},
+    ).fetchall()
+
+
+def dashboard_workers(
+    conn: sqlite3.Connection,
+    *,
+    online_since_ms: int,
+    online: bool | None,
+    limit: int,
+    offset: int,
+) -> list[sqlite3.Row]:
+    """Workers by registration order with their active load; `online` filters on the heartbeat time."""
+    return conn.execute(
+        """
+        WITH page AS (
+          SELECT * FROM workers
+          WHERE :online IS NULL
+             OR (:online = 1 AND last_heartbeat_ms >= :since)
+             OR (:online = 0 AND (last_heartbeat_ms IS NULL OR last_heartbeat_ms < :since))
+          ORDER BY created_at LIMIT :limit OFFSET :offset
+        )
+        SELECT page.*,
+               COALESCE(SUM(t.estimate_points), 0) AS load_points,
+               COUNT(t.task_id) AS load_tasks,
+               COALESCE(page.last_heartbeat_ms >= :since, 0) AS online
+        FROM page LEFT JOIN tasks t
+          ON t.assigned_worker_id = page.worker_id AND t.status IN ('leased','in_progress')
+        GROUP BY page.worker_id
+        ORDER BY page.created_at
+        """,
+        {"online": None if online is None else int(online), "since": online_since_ms, "limit": limit, "offset": offset},
+    ).fetchall()
+
+
+def dashboard_tasks(
+    conn: sqlite3.Connection, *, repo: str | None, status: str | None, limit: int, offset: int
+) -> list[sqlite3.Row]:
+    where, params = [], []
+    if repo is not None:
+        where.append("repo = ?")
+        params.append(repo)
+    if status is not None:
+        where.append("status = ?")
+        params.append(status)
+    sql = "SELECT * FROM tasks"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY updated_ms DESC LIMIT ? OFFSET ?"
+    return conn.execute(sql, (*params, limit, offset)).fetchall()
+
+
+def dashboard_events(conn: sqlite3.Connection, *, repo: str | None, before_id: int | None, limit: int) -> list[sqlite3.Row]:
+    where, params = [], []
+    if repo is not None:
+        where.append("repo = ?")
+        params.append(repo)
+    if before_id is not None:
+        where.append("id < ?")
+        params.append(before_id)
+    sql = "SELECT * FROM events"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT ?"
+    return conn.execute(sql, (*params, limit)).fetchall()
+
+
 def list_workers(conn: sqlite3.Connection) -> list[sqlite3.Row]:
     cur = conn.execute("SELECT * FROM workers ORDER BY created_at ASC")
     return cur.fetchall()
@@ -387,7 +1218,7 @@ def worker_load(conn: sqlite3.Connection, worker_id: str) -> tuple[int, int]:
         SELECT
           COALESCE(SUM(estimate_points), 0) AS pts,
           COUNT(*) AS n
-        FROM tasks
+        FROM tasks INDEXED BY idx_tasks_active_load
         WHERE assigned_worker_id = ?
           AND status IN ('leased','in_progress')
         """,
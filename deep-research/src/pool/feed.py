@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+
+from fastapi.concurrency import run_in_threadpool
+
+from . import db
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class EventFilter:
+    types: frozenset[str] = frozenset()
+    repo: str | None = None
+    task_id: str | None = None
+    actor_worker_id: str | None = None
+
+    def matches(self, event: dict[str, Any]) -> bool:
+        if self.types and event["type"] not in self.types:
+            return False
+        if self.repo is not None and event["repo"] != self.repo:
+            return False
+        if self.task_id is not None and event["task_id"] != self.task_id:
+            return False
+        if self.actor_worker_id is not None and event["actor_worker_id"] != self.actor_worker_id:
+            return False
+        return True
+
+
+def event_dict(row: Any) -> dict[str, Any]:
+    return {
+        "id": int(row["id"]),
+        "ts": row["ts"],
+        "type": row["type"],
+        "actor_worker_id": row["actor_worker_id"],
+        "repo": row["repo"],
+        "task_id": row["task_id"],
+        "details": db.json_loads(row["details_json"]) or {},
+    }
+
+
+@dataclass(eq=False)
+class Subscription:
+    """One client's view of the feed: a bounded queue filled from the event loop it subscribed on."""
+
+    filter: EventFilter
+    start_id: int
+    replay_upto: int
+    loop: asyncio.AbstractEventLoop
+    max_queue: int
+    queue: asyncio.Queue[list[dict[str, Any]] | None] = field(default_factory=asyncio.Queue)
+    overflowed: bool = False
+    _queued: int = 0
+
+    def _push(self, events: list[dict[str, Any]] | None) -> None:
+        if self.overflowed:
+            return
+        if events is None:
+            self.queue.put_nowait(None)
+            return
+        self._queued += len(events)
+        if self._queued > self.max_queue:
+            # Slow consumer: end the stream; the client reconnects with Last-Event-ID and replays from the DB.
+            self.overflowed = True
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(events)
+
+    async def get(self, timeout: float) -> list[dict[str, Any]] | None:
+        """Next batch of matching events, [] on timeout, None once the stream should end."""
+        try:
+            batch = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        if batch is not None:
+            self._queued -= len(batch)
+        return batch
+
+
+class EventFeed:
+    """
+    Tails the events table by id and fans new rows out to subscribers.
+
+    A single background thread reads each new range once, after a writer commit that wrote events
+    (`notify()`), and hands every subscriber the rows matching its filter; clients never query SQLite
+    for live events themselves. Resuming (`Last-Event-ID`) replays the gap between the client's id and
+    the feed cursor from the DB, so nothing is lost or duplicated across reconnects.
+    """
+
+    def __init__(self, pool: db.ConnectionPool, *, batch_size: int = 1000, max_queue: int = 10_000) -> None:
+        self._pool = pool
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._dirty = False
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+        self._subscribers: set[Subscription] = set()
+        with pool.reader() as conn:
+            self._cursor = db.last_event_id(conn)
+
+    @property
+    def cursor(self) -> int:
+        return self._cursor
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name="pool-event-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        thread = self._thread
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for sub in subscribers:
+            sub.loop.call_soon_threadsafe(sub._push, None)
+        if thread is not None:
+            thread.join(timeout)
+        self._thread = None
+
+    def notify(self) -> None:
+        with self._cond:
+            self._dirty = True
+            self._cond.notify_all()
+
+    def subscribe(self, event_filter: EventFilter, *, last_event_id: int | None = None) -> Subscription:
+        """
+        Registers a subscriber on the running loop. Live delivery starts after the current cursor;
+        with `last_event_id`, `replay()` covers the events between it and the cursor.
+        """
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            start = self._cursor if last_event_id is None else min(last_event_id, self._cursor)
+            sub = Subscription(
+                filter=event_filter, start_id=start, replay_upto=self._cursor, loop=loop, max_queue=self.max_queue
+            )
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._cond:
+            self._subscribers.discard(sub)
+
+    def replay(self, sub: Subscription, after_id: int) -> list[dict[str, Any]]:
+        """
+        Next batch of stored events for `sub` after `after_id`, up to the cursor at subscribe time
+        (blocking; [] when the gap is covered).
+        """
+        if after_id >= sub.replay_upto:
+            return []
+        with self._pool.reader() as conn:
+            rows = db.list_events(
+                conn,
+                after_id=after_id,
+                upto_id=sub.replay_upto,
+                types=sorted(sub.filter.types),
+                repo=sub.filter.repo,
+                task_id=sub.filter.task_id,
+                actor_worker_id=sub.filter.actor_worker_id,
+                limit=self.batch_size,
+            )
+        return [event_dict(r) for r in rows]
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping or self._dirty)
+                if self._stopping:
+                    return
+                self._dirty = False
+            try:
+                self._poll()
+            except Exception:
+                logger.exception("event feed poll failed")
+
+    def _poll(self) -> None:
+        with self._pool.reader() as conn:
+            if not self._subscribers:
+                # Nobody listening: just move the cursor.
+                last = db.last_event_id(conn)
+                with self._cond:
+                    self._cursor = max(self._cursor, last)
+                return
+            while True:
+                rows = db.list_events(conn, after_id=self._cursor, limit=self.batch_size)
+                if not rows:
+                    return
+                events = [event_dict(r) for r in rows]
+                with self._cond:
+                    # Advance and fan out atomically with respect to subscribe().
+                    self._cursor = events[-1]["id"]
+                    for sub in self._subscribers:
+                        matched = [e for e in events if sub.filter.matches(e)]
+                        if matched:
+                            sub.loop.call_soon_threadsafe(sub._push, matched)
+
+
+async def stream(feed: EventFeed, sub: Subscription, *, keepalive: float = 15.0) -> AsyncIterator[str]:
+    """Formats a subscription as a `text/event-stream` body: the resume gap first, then live events."""
+    try:
+        yield "retry: 3000\n\n"
+        after = sub.start_id
+        while True:
+            batch = await run_in_threadpool(feed.replay, sub, after)
+            if not batch:
+                break
+            after = batch[-1]["id"]
+            yield "".join(_format(e) for e in batch)
+        while True:
+            batch = await sub.get(keepalive)
+            if batch is None:
+                return
+            if not batch:
+                yield ": keepalive\n\n"
+                continue
+            yield "".join(_format(e) for e in batch)
+    finally:
+        feed.unsubscribe(sub)
+
+
+def _format(event: dict[str, Any]) -> str:
+    # No `event:` field, so EventSource.onmessage sees every type; the type is in the payload.
+    return f"id: {event['id']}\ndata: {db.json_dumps(event)}\n\n"
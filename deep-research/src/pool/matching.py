@@ -0,0 +1,289 @@
+"""
+Batch task→worker assignment as a min-cost flow (the optional "matching" scheduler mode).
+
+The greedy scheduler hands each ready task, in priority order, to the least-loaded eligible worker.
+That can strand capacity: a high-priority task takes the only worker that could also have served a
+scarce-skill task, although another worker could have taken it. This module solves a cycle's batch
+of ready tasks jointly instead:
+
+    source ─▶ [area lock, cap 1] ─▶ task ─▶ class ─▶ worker ─▶ sink
+            └──────────────────────▶ task                     (cap = free task slots)
+
+A task edge earns its value (estimate points first, then priority), plus a bonus above any points
+for the tasks the caller wants kept (the ones greedy placed), so the flow adds work around them
+rather than trading them for bigger tasks. A class groups tasks with the
+same skills and estimate, which fit the same workers; a class→worker edge costs the worker's current
+load so ties still spread work. Each (repo, area) lock admits one task. The flow respects
+concurrency and area locks exactly. Point capacity is enforced by only offering tasks that fit a
+worker on their own and repairing any worker that the flow overfilled.
+"""
+
+from __future__ import annotations
+
+import heapq
+import time
+from collections import Counter, deque
+from typing import Callable, Collection, Iterable
+
+from .state import RepoState, TaskState, WorkerState
+
+
+# Task value: kept tasks first, then points (utilisation), priority (0–1000) breaks ties; load costs
+# stay below all of them.
+KEEP_WEIGHT = 1_000_000_000_000
+POINTS_WEIGHT = 1_000_000
+PRIORITY_WEIGHT = 100
+
+INF = float("inf")
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class MinCostFlow:
+    """Successive shortest paths with Johnson potentials: one Bellman-Ford pass, then Dijkstra per path."""
+
+    def __init__(self, n: int) -> None:
+        self.n = n
+        # Per node: edges as [to, capacity, cost, index of the reverse edge in graph[to]].
+        self.graph: list[list[list[int]]] = [[] for _ in range(n)]
+
+    def add_edge(self, u: int, v: int, capacity: int, cost: int) -> list[int]:
+        forward = [v, capacity, cost, len(self.graph[v])]
+        backward = [u, 0, -cost, len(self.graph[u])]
+        self.graph[u].append(forward)
+        self.graph[v].append(backward)
+        return forward
+
+    def flow_on(self, edge: list[int]) -> int:
+        """Flow currently on a forward edge returned by add_edge."""
+        return self.graph[edge[0]][edge[3]][1]
+
+    def _bellman_ford(self, s: int) -> list[float]:
+        dist = [INF] * self.n
+        dist[s] = 0
+        queued = [False] * self.n
+        q = deque([s])
+        while q:
+            u = q.popleft()
+            queued[u] = False
+            du = dist[u]
+            for v, cap, cost, _ in self.graph[u]:
+                if cap > 0 and du + cost < dist[v]:
+                    dist[v] = du + cost
+                    if not queued[v]:
+                        queued[v] = True
+                        q.append(v)
+        return dist
+
+    def run(self, s: int, t: int, *, deadline: float | None = None) -> tuple[int, int]:
+        """
+        Pushes flow from `s` to `t` while the cheapest path has negative cost (i.e. adds value).
+        Returns (flow, cost). Raises BudgetExceeded once `time.perf_counter()` passes `deadline`.
+        """
+        graph = self.graph
+        h = [d if d < INF else 0 for d in self._bellman_ford(s)]
+        flow = cost = 0
+        while True:
+            if deadline is not None and time.perf_counter() > deadline:
+                raise BudgetExceeded
+            dist = [INF] * self.n
+            prev: list[tuple[int, int] | None] = [None] * self.n
+            dist[s] = 0
+            heap = [(0, s)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                if u == t:
+                    # Settled the sink: capping the potential update at dist[t] below keeps every
+                    # residual reduced cost non-negative, so nodes further out need not be settled.
+                    break
+                hu = h[u]
+                for i, (v, cap, c, _) in enumerate(graph[u]):
+                    if cap <= 0:
+                        continue
+                    nd = d + c + hu - h[v]
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        prev[v] = (u, i)
+                        heapq.heappush(heap, (nd, v))
+            if dist[t] == INF:
+                break
+            dt = dist[t]
+            for v in range(self.n):
+                h[v] += dist[v] if dist[v] < dt else dt
+            path_cost = h[t] - h[s]
+            if path_cost >= 0:
+                break
+            # Bottleneck along the path (1 in practice: every path crosses a unit task edge).
+            push = INF
+            v = t
+            while v != s:
+                u, i = prev[v]  # type: ignore[misc]
+                push = min(push, graph[u][i][1])
+                v = u
+            v = t
+            while v != s:
+                u, i = prev[v]  # type: ignore[misc]
+                edge = graph[u][i]
+                edge[1] -= push
+                graph[v][edge[3]][1] += push
+                v = u
+            flow += int(push)
+            cost += int(push * path_cost)
+        return flow, cost
+
+
+def task_value(task: TaskState, keep: Collection[str] = ()) -> int:
+    value = task.estimate_points * POINTS_WEIGHT + task.priority * PRIORITY_WEIGHT
+    return value + KEEP_WEIGHT if task.task_id in keep else value
+
+
+def _load_key(ws: WorkerState) -> tuple[int, int, float]:
+    return (ws.used_points, ws.used_tasks, -ws.reputation)
+
+
+def plan_matching(
+    tasks: Iterable[TaskState],
+    *,
+    repos: dict[str, RepoState],
+    candidates_for: Callable[[int], list[WorkerState]],
+    available: set[str],
+    budget_seconds: float,
+    max_tasks: int,
+    max_candidates: int,
+    keep: Collection[str] = (),
+) -> list[tuple[TaskState, WorkerState]] | None:
+    """
+    Jointly assigns up to `max_tasks` of `tasks` (priority order, best first) to available workers.
+
+    Returns (task, worker) pairs that fit every constraint, or None if the time budget ran out.
+    Tasks whose repo is throttled or whose area is already locked are left out; each task is offered
+    to the `max_candidates` least-loaded workers that could take it. Tasks in `keep` are placed ahead
+    of any others whenever the constraints allow it.
+    """
+    deadline = time.perf_counter() + budget_seconds
+
+    # Node ids: 0 = source, 1 = sink, then areas, tasks, classes, workers as they are first seen.
+    # Tasks with the same skill signature and estimate fit exactly the same workers, so they share a
+    # class node and only the class is wired to workers: edges grow with tasks + classes × candidates.
+    S, T = 0, 1
+    next_id = 2
+    area_nodes: dict[tuple[str, str], int] = {}
+    class_nodes: dict[tuple[int, int], int | None] = {}
+    worker_nodes: dict[str, int] = {}
+    workers: dict[str, WorkerState] = {}
+    edges: list[tuple[int, int, int, int]] = []
+    task_edges: list[tuple[TaskState, tuple[int, int], int]] = []  # (task, class, index into edges)
+    class_edges: list[tuple[tuple[int, int], str, int]] = []  # (class, worker_id, index into edges)
+
+    class_slots: dict[tuple[int, int], int] = {}
+    class_free_tasks: Counter[tuple[int, int]] = Counter()
+    class_areas: set[tuple[tuple[int, int], str, str]] = set()
+    n_tasks = 0
+
+    for task in tasks:
+        rs = repos.get(task.repo)
+        if rs is None or rs.throttled:
+            continue
+        locked = rs.area_locks_enabled and bool(task.area)
+        if locked and rs.locked_areas.get(task.area):
+            continue
+        cls = (task.required_mask, task.estimate_points)
+        if cls not in class_nodes:
+            eligible = [
+                ws
+                for ws in candidates_for(task.required_mask)
+                if ws.worker_id in available
+                and ws.used_tasks < ws.max_concurrent_tasks
+                and ws.used_points + task.estimate_points <= ws.capacity_points
+            ]
+            if len(eligible) > max_candidates:
+                eligible = heapq.nsmallest(max_candidates, eligible, key=_load_key)
+            if not eligible:
+                class_nodes[cls] = None
+            else:
+                class_node = class_nodes[cls] = next_id
+                next_id += 1
+                class_slots[cls] = sum(ws.max_concurrent_tasks - ws.used_tasks for ws in eligible)
+                for ws in eligible:
+                    node = worker_nodes.get(ws.worker_id)
+                    if node is None:
+                        node = worker_nodes[ws.worker_id] = next_id
+                        next_id += 1
+                        workers[ws.worker_id] = ws
+                        edges.append((node, T, ws.max_concurrent_tasks - ws.used_tasks, 0))
+                    class_edges.append((cls, ws.worker_id, len(edges)))
+                    edges.append((class_node, node, ws.max_concurrent_tasks - ws.used_tasks, ws.used_points))
+            if time.perf_counter() > deadline:
+                return None
+        class_node = class_nodes[cls]
+        if class_node is None:
+            continue
+        # Tasks come best first and a class's tasks are interchangeable, so an optimum only uses
+        # the first task per area and, of the rest, no more than the class has slots. Kept tasks
+        # count towards both but are never left out.
+        kept = task.task_id in keep
+        if locked:
+            if (cls, task.repo, task.area) in class_areas and not kept:
+                continue
+            class_areas.add((cls, task.repo, task.area))
+        else:
+            if class_free_tasks[cls] >= class_slots[cls] and not kept:
+                continue
+            class_free_tasks[cls] += 1
+
+        task_node = next_id
+        next_id += 1
+        if locked:
+            key = (task.repo, task.area)
+            area_node = area_nodes.get(key)
+            if area_node is None:
+                area_node = area_nodes[key] = next_id
+                next_id += 1
+                edges.append((S, area_node, 1, 0))
+            edges.append((area_node, task_node, 1, -task_value(task, keep)))
+        else:
+            edges.append((S, task_node, 1, -task_value(task, keep)))
+        task_edges.append((task, cls, len(edges)))
+        edges.append((task_node, class_node, 1, 0))
+        n_tasks += 1
+        if n_tasks >= max_tasks:
+            break
+
+    if not task_edges:
+        return []
+    mcf = MinCostFlow(next_id)
+    refs = [mcf.add_edge(u, v, cap, cost) for u, v, cap, cost in edges]
+    try:
+        mcf.run(S, T, deadline=deadline)
+    except BudgetExceeded:
+        return None
+
+    # Hand each class's routed tasks (best first) to the workers its flow reached.
+    routed: dict[tuple[int, int], list[TaskState]] = {}
+    for task, cls, i in task_edges:
+        if refs[i][1] == 0:  # unit edge saturated: task is placed
+            routed.setdefault(cls, []).append(task)
+    for queue in routed.values():
+        queue.sort(key=lambda t: t.sort_key, reverse=True)
+    chosen: dict[str, list[TaskState]] = {}
+    for cls, worker_id, i in class_edges:
+        queue = routed.get(cls)
+        if not queue:
+            continue
+        for _ in range(mcf.flow_on(refs[i])):
+            chosen.setdefault(worker_id, []).append(queue.pop())
+
+    # Point capacity is not part of the flow; drop the least valuable tasks from any overfilled worker.
+    pairs: list[tuple[TaskState, WorkerState]] = []
+    for worker_id, assigned in chosen.items():
+        ws = workers[worker_id]
+        free = ws.capacity_points - ws.used_points
+        assigned.sort(key=lambda t: task_value(t, keep), reverse=True)
+        while sum(t.estimate_points for t in assigned) > free:
+            assigned.pop()
+        pairs.extend((t, ws) for t in assigned)
+    return pairs
@@ -61,6 +61,14 @@ class LeaseView(BaseModel):
 class WorkResponse(BaseModel):
     worker_id: str
     leases: list[LeaseView]
+    version: int = 0
+
+
+class SyncResponse(BaseModel):
+    worker_id: str
+    server_time: datetime
+    leases: list[LeaseView]
+    version: int = 0
 
 
 class TaskArtifact(BaseModel):
@@ -103,6 +111,15 @@ class TaskCreateResponse(BaseModel):
     task_id: str
 
 
+class TaskBatchCreateRequest(BaseModel):
+    tasks: list[TaskCreateRequest] = Field(min_length=1, max_length=5000)
+
+
+class TaskBatchCreateResponse(BaseModel):
+    ok: bool = True
+    task_ids: list[str]
+
+
 class AdminState(BaseModel):
     workers_online: int
     tasks_ready: int
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+from . import db
+from .feed import EventFilter, event_dict
+
+
+logger = logging.getLogger(__name__)
+
+_DURATION_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*$")
+_UNITS = {"": 86400, "s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(value: str) -> timedelta | None:
+    """'90s', '15m', '36h', '7d' (bare numbers are days); 'forever', 'never' or '0' keep events forever."""
+    if value.strip().lower() in {"forever", "never", "0"}:
+        return None
+    m = _DURATION_RE.match(value.lower())
+    if not m:
+        raise ValueError(f"Invalid duration: {value!r}")
+    return timedelta(seconds=float(m.group(1)) * _UNITS[m.group(2)])
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    How long events stay in the live table, per event type. `None` keeps events of that type forever.
+    """
+
+    default_ttl: timedelta | None = None
+    ttls: dict[str, timedelta | None] = field(default_factory=lambda: {"worker.heartbeat": timedelta(days=1)})
+
+    @classmethod
+    def parse(cls, specs: Iterable[str]) -> "RetentionPolicy":
+        """Builds a policy from `TYPE=DURATION` specs; `default=DURATION` sets the fallback."""
+        policy = cls()
+        for spec in specs:
+            name, sep, duration = spec.partition("=")
+            if not sep or not name.strip():
+                raise ValueError(f"Invalid retention spec (expected TYPE=DURATION): {spec!r}")
+            ttl = parse_duration(duration)
+            if name.strip() == "default":
+                policy.default_ttl = ttl
+            else:
+                policy.ttls[name.strip()] = ttl
+        return policy
+
+    def ttl_for(self, event_type: str) -> timedelta | None:
+        return self.ttls.get(event_type, self.default_ttl)
+
+
+class EventArchive:
+    """
+    Daily gzip NDJSON files (`events-YYYY-MM-DD.ndjson.gz`, by the event's UTC day).
+
+    Events carry `ts_ms` alongside `ts`; files are bucketed and ranges compared on the epoch value, so
+    timestamps written with different UTC offsets still order correctly.
+
+    Batches are appended as separate gzip members, so a file is never rewritten. A crash between an
+    append and the matching DELETE can archive an event twice; `read()` drops the duplicate ids.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def path_for(self, day: date) -> Path:
+        return self.directory / f"events-{day.isoformat()}.ndjson.gz"
+
+    def append(self, events: list[dict[str, Any]]) -> None:
+        by_day: dict[date, list[dict[str, Any]]] = {}
+        for e in events:
+            by_day.setdefault(_utc_day(_ts_ms(e)), []).append(e)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for day, rows in by_day.items():
+            data = "".join(db.json_dumps(e) + "\n" for e in rows).encode("utf-8")
+            with open(self.path_for(day), "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="ab") as gz:
+                    gz.write(data)
+                raw.flush()
+                os.fsync(raw.fileno())
+
+    def read(
+        self,
+        start: datetime,
+        end: datetime,
+        *,
+        event_filter: EventFilter | None = None,
+        limit: int | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Archived events with `start <= ts < end`, in (ts, id) order."""
+        start_ms, end_ms = db.to_ms(start), db.to_ms(end)
+        n = 0
+        day, last = _utc_day(start_ms), _utc_day(end_ms)
+        while day <= last:
+            path = self.path_for(day)
+            day += timedelta(days=1)
+            if not path.exists():
+                continue
+            seen: dict[int, dict[str, Any]] = {}
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    e = db.json_loads(line)
+                    if not (start_ms <= _ts_ms(e) < end_ms):
+                        continue
+                    if event_filter is not None and not event_filter.matches(e):
+                        continue
+                    seen[int(e["id"])] = e
+            for e in sorted(seen.values(), key=lambda e: (_ts_ms(e), e["id"])):
+                yield e
+                n += 1
+                if limit is not None and n >= limit:
+                    return
+
+
+def _ts_ms(event: dict[str, Any]) -> int:
+    # Files written before events carried ts_ms only have the ISO timestamp.
+    ts_ms = event.get("ts_ms")
+    return int(ts_ms) if ts_ms is not None else db.to_ms(db.from_iso(event["ts"]))
+
+
+def _utc_day(ts_ms: int) -> date:
+    return db.from_ms(ts_ms).date()
+
+
+def run_retention(
+    pool: db.ConnectionPool,
+    archive: EventArchive,
+    policy: RetentionPolicy,
+    *,
+    now: datetime | None = None,
+    batch_size: int = 5000,
+    should_stop: Callable[[], bool] | None = None,
+) -> dict[str, int]:
+    """
+    Moves expired events into the archive, one batch at a time: read on a reader snapshot, append and
+    fsync the archive, then delete the batch in its own short write transaction. Returns per-type counts.
+    """
+    now = now or db.utc_now()
+    moved: dict[str, int] = {}
+    with pool.reader() as conn:
+        types = db.event_types(conn)
+    for event_type in types:
+        ttl = policy.ttl_for(event_type)
+        if ttl is None:
+            continue
+        before_ms = db.to_ms(now - ttl)
+        while not (should_stop and should_stop()):
+            with pool.reader() as conn:
+                rows = db.expired_events(conn, event_type=event_type, before_ms=before_ms, limit=batch_size)
+            if not rows:
+                break
+            archive.append([{**event_dict(r), "ts_ms": r["ts_ms"]} for r in rows])
+            with pool.writer() as conn:
+                db.delete_events(conn, [int(r["id"]) for r in rows])
+            moved[event_type] = moved.get(event_type, 0) + len(rows)
+            if len(rows) < batch_size:
+                break
+    if moved:
+        logger.info("archived events: %s", moved)
+    return moved
+
+
+class RetentionWorker:
+    """Runs `run_retention` every `interval_seconds` on a background thread."""
+
+    def __init__(
+        self,
+        pool: db.ConnectionPool,
+        archive: EventArchive,
+        policy: RetentionPolicy,
+        *,
+        interval_seconds: float = 3600.0,
+        batch_size: int = 5000,
+    ) -> None:
+        self._pool = pool
+        self.archive = archive
+        self.policy = policy
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="pool-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 30.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def run_once(self) -> dict[str, int]:
+        return run_retention(
+            self._pool, self.archive, self.policy, batch_size=self.batch_size, should_stop=self._stop.is_set
+        )
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("event retention failed")
+            self._stop.wait(self.interval_seconds)
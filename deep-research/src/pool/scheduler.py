@@ -1,156 +1,340 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime, timedelta, timezone
+import bisect
+import heapq
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
 from typing import Iterable
 
 from . import db
+from .matching import plan_matching
+from .state import QueueKey, SchedulerState, TaskState, WorkerState
+
+
+ASSIGNMENT_ENGINES = ("greedy", "matching")
+SKIP_REASONS = ("skipped_throttle", "skipped_area_lock", "skipped_no_worker")
 
 
 @dataclass(frozen=True)
 class SchedulerConfig:
     lease_ttl_seconds: int = 30 * 60
     heartbeat_ttl_seconds: int = 90
+    reconcile_seconds: int = 60
+    # "greedy": each task, in priority order, goes to the least-loaded eligible worker.
+    # "matching": the cycle's batch is solved as a min-cost flow (pool.matching) and used when it places
+    # every task greedy would and more estimate points; greedy is the fallback otherwise, including
+    # when the solve overruns its budget.
+    assignment: str = "greedy"
+    matching_budget_ms: int = 500
+    matching_max_tasks: int = 1000
+    matching_max_candidates: int = 32
 
 
-def _is_online(last_heartbeat_iso: str | None, *, now: datetime, ttl_seconds: int) -> bool:
-    if not last_heartbeat_iso:
-        return False
-    try:
-        ts = datetime.fromisoformat(last_heartbeat_iso)
-    except ValueError:
-        return False
-    if ts.tzinfo is None:
-        ts = ts.replace(tzinfo=timezone.utc)
-    return (now - ts).total_seconds() <= ttl_seconds
+@dataclass
+class _Plan:
+    """Assignments for one cycle, with the worker loads and area locks they add and the tasks left out."""
+
+    pairs: list[tuple[TaskState, WorkerState]] = field(default_factory=list)
+    points: dict[str, int] = field(default_factory=dict)
+    tasks: dict[str, int] = field(default_factory=dict)
+    # (repo, area) -> sort key of the planned task that took the area
+    areas: dict[tuple[str, str], tuple[int, int, str]] = field(default_factory=dict)
+    planned: set[str] = field(default_factory=set)
+    assigned_points: int = 0
+    skipped: dict[str, int] = field(default_factory=lambda: dict.fromkeys(SKIP_REASONS, 0))
+
+    def fits(self, ws: WorkerState, task: TaskState) -> bool:
+        return (
+            ws.used_points + self.points.get(ws.worker_id, 0) + task.estimate_points <= ws.capacity_points
+            and ws.used_tasks + self.tasks.get(ws.worker_id, 0) + 1 <= ws.max_concurrent_tasks
+        )
+
+    def rank(self, ws: WorkerState) -> tuple[int, int, float, str]:
+        # Rank: lowest load points, then lowest concurrent tasks, then highest reputation, then most recent heartbeat
+        # Use tuple that sorts ascending; for reputation, negate to prefer higher.
+        return (
+            ws.used_points + self.points.get(ws.worker_id, 0),
+            ws.used_tasks + self.tasks.get(ws.worker_id, 0),
+            -ws.reputation,
+            ws.last_heartbeat or "",
+        )
 
+    def add(self, task: TaskState, ws: WorkerState) -> None:
+        self.pairs.append((task, ws))
+        self.points[ws.worker_id] = self.points.get(ws.worker_id, 0) + task.estimate_points
+        self.tasks[ws.worker_id] = self.tasks.get(ws.worker_id, 0) + 1
+        if task.area:
+            self.areas.setdefault((task.repo, task.area), task.sort_key)
+        self.planned.add(task.task_id)
+        self.assigned_points += task.estimate_points
 
-def _parse_json_list(value: str) -> list[str]:
-    data = db.json_loads(value)
-    if not data:
-        return []
-    return [str(x) for x in data]
+
+def _area_locked(state: SchedulerState, plan: _Plan, repo: str, area: str) -> bool:
+    rs = state.repos[repo]
+    return bool(rs.area_locks_enabled and area and (rs.locked_areas.get(area) or (repo, area) in plan.areas))
+
+
+def _free_workers(state: SchedulerState, available: set[str], plan: _Plan) -> list[WorkerState]:
+    """Available workers with a task slot and a point to spare, in `state.workers` order."""
+    return [
+        ws
+        for ws in state.workers.values()
+        if ws.worker_id in available
+        and ws.used_tasks + plan.tasks.get(ws.worker_id, 0) < ws.max_concurrent_tasks
+        and ws.used_points + plan.points.get(ws.worker_id, 0) < ws.capacity_points
+    ]
+
+
+def _assign(plan: _Plan, free: list[WorkerState], task: TaskState) -> bool:
+    """Gives `task` to its best-ranked free worker; drops that worker from `free` once it is full."""
+    best: WorkerState | None = None
+    best_key: tuple[int, int, float, str] | None = None
+    for ws in free:
+        if task.required_mask & ~ws.skill_mask or not plan.fits(ws, task):
+            continue
+        key = plan.rank(ws)
+        if best_key is None or key < best_key:
+            best, best_key = ws, key
+    if best is None:
+        return False
+    plan.add(task, best)
+    if not _has_room(plan, best):
+        free.remove(best)
+    return True
 
 
-def _skills_match(worker_skills: set[str], required_skills: Iterable[str]) -> bool:
-    required = {s.strip().lower() for s in required_skills if s.strip()}
-    if not required:
-        return True
-    return required.issubset({s.strip().lower() for s in worker_skills if s.strip()})
+def _has_room(plan: _Plan, ws: WorkerState) -> bool:
+    return (
+        ws.used_tasks + plan.tasks.get(ws.worker_id, 0) < ws.max_concurrent_tasks
+        and ws.used_points + plan.points.get(ws.worker_id, 0) < ws.capacity_points
+    )
 
 
-def run_scheduling_cycle(conn, *, config: SchedulerConfig) -> dict[str, int]:
+def _plan_greedy(state: SchedulerState, tasks: Iterable[TaskState], available: set[str], plan: _Plan) -> _Plan:
     """
-    Runs a single scheduling cycle:
-    - Requeues expired leases
-    - Assigns ready tasks to eligible workers using greedy matching
+    Adds a greedy assignment of `tasks` (in priority order) on top of what `plan` already holds, and
+    counts each task it leaves out under the first rule that stopped it, at the point it decides.
     """
-    now = db.utc_now()
-    requeued = db.requeue_expired_leases(conn)
-
-    repos = db.list_repos(conn)
-    repo_cfg = {}
-    for r in repos:
-        row = db.repo_row(conn, r)
-        if row:
-            repo_cfg[r] = {
-                "max_open_prs": int(row["max_open_prs"]),
-                "area_locks_enabled": bool(int(row["area_locks_enabled"])),
-            }
-
-    workers = db.list_workers(conn)
-    worker_state = {}
-    for w in workers:
-        online = _is_online(w["last_heartbeat"], now=now, ttl_seconds=config.heartbeat_ttl_seconds)
-        skills = set(_parse_json_list(w["skills_json"]))
-        used_pts, used_n = db.worker_load(conn, w["worker_id"])
-        worker_state[w["worker_id"]] = {
-            "online": online,
-            "status": w["status"],
-            "skills": skills,
-            "capacity_points": int(w["capacity_points"]),
-            "max_concurrent_tasks": int(w["max_concurrent_tasks"]),
-            "used_points": used_pts,
-            "used_tasks": used_n,
-            "reputation": float(w["reputation"]),
-            "last_heartbeat": w["last_heartbeat"],
-        }
-
-    area_locks = {r: db.locked_areas(conn, r) for r in repos}
-    open_prs = {r: db.count_open_prs(conn, r) for r in repos}
+    free = _free_workers(state, available, plan)
+    for task in tasks:
+        if task.task_id in plan.planned:
+            continue
+        rs = state.repos.get(task.repo)
+        if rs is None:
+            continue
+        if rs.throttled:
+            plan.skipped["skipped_throttle"] += 1
+        elif _area_locked(state, plan, task.repo, task.area):
+            plan.skipped["skipped_area_lock"] += 1
+        elif not free or not _assign(plan, free, task):
+            # With every worker full the rest is only counted, not matched against workers.
+            plan.skipped["skipped_no_worker"] += 1
+    return plan
 
-    assigned = 0
-    skipped_throttle = 0
-    skipped_area_lock = 0
-    skipped_no_worker = 0
-
-    ready_tasks = db.list_ready_tasks(conn)
-    for task in ready_tasks:
-        repo = task["repo"]
-        cfg = repo_cfg.get(repo)
-        if not cfg:
+
+def _open_queues(state: SchedulerState, free: list[WorkerState], plan: _Plan) -> list[QueueKey]:
+    """
+    Ready queues a free worker could serve: repo known and not throttled, area not locked, and some
+    free worker with the skills and the points for the queue's tasks. Costs one check per skill
+    signature and free worker, one per repo and one per queue of an open repo; no task is visited.
+    """
+    keys: list[QueueKey] = []
+    for mask, by_repo in state.queues_by_mask.items():
+        max_points = max(
+            (ws.capacity_points - ws.used_points - plan.points.get(ws.worker_id, 0) for ws in free if mask & ~ws.skill_mask == 0),
+            default=0,
+        )
+        if max_points <= 0:
             continue
+        for repo, queue_keys in by_repo.items():
+            rs = state.repos.get(repo)
+            if rs is None or rs.throttled:
+                continue
+            for key in queue_keys:
+                if key[3] <= max_points and not _area_locked(state, plan, repo, key[1]):
+                    keys.append(key)
+    return keys
 
-        max_open = int(cfg["max_open_prs"])
-        if max_open == 0 or open_prs.get(repo, 0) >= max_open:
-            skipped_throttle += 1
+
+def _plan_queues(state: SchedulerState, available: set[str], plan: _Plan) -> _Plan:
+    """
+    Greedy over every ready task (a full pass), same choices as `_plan_greedy` over all of them in
+    priority order, but driven by the heads of the open ready queues: a queue whose head finds no
+    worker is done (its tasks are interchangeable), an area queue is done once the area is taken, and
+    the pass ends as soon as no free worker is left. Skip counts come from `_skipped_all`.
+    """
+    held = set(plan.areas)
+    free = _free_workers(state, available, plan)
+    heap = [(state.queues[key][0], 0, key) for key in _open_queues(state, free, plan)] if free else []
+    heapq.heapify(heap)
+    # Smallest estimate per skill signature that already found no worker; capacity only shrinks
+    # during a cycle, so anything as large with the same signature is skipped unseen.
+    stuck: dict[int, int] = {}
+    while heap and free:
+        sort_key, i, key = heapq.heappop(heap)
+        repo, area, mask, points = key
+        if points >= stuck.get(mask, points + 1):
             continue
+        if _area_locked(state, plan, repo, area):
+            continue
+        queue = state.queues[key]
+        task = state.ready[sort_key[2]]
+        if task.task_id not in plan.planned and not _assign(plan, free, task):
+            stuck[mask] = points
+            continue
+        if i + 1 < len(queue):
+            heapq.heappush(heap, (queue[i + 1], i + 1, key))
+    plan.skipped = _skipped_all(state, plan, held)
+    return plan
 
-        if cfg["area_locks_enabled"]:
-            area = (task["area"] or "").strip()
-            if area and area in area_locks.get(repo, set()):
-                skipped_area_lock += 1
-                continue
 
-        required_skills = _parse_json_list(task["required_skills_json"])
-        estimate_points = int(task["estimate_points"])
+def _plan_matching(
+    state: SchedulerState,
+    tasks: list[TaskState] | None,
+    available: set[str],
+    config: SchedulerConfig,
+    *,
+    keep: set[str],
+) -> _Plan | None:
+    if tasks is None:
+        batch: Iterable[TaskState] = state.ready_tasks(_open_queues(state, _free_workers(state, available, _Plan()), _Plan()))
+    else:
+        batch = tasks
+    pairs = plan_matching(
+        batch,
+        repos=state.repos,
+        candidates_for=state.candidates,
+        available=available,
+        budget_seconds=config.matching_budget_ms / 1000,
+        max_tasks=config.matching_max_tasks,
+        max_candidates=config.matching_max_candidates,
+        keep=keep,
+    )
+    if pairs is None:
+        return None
+    plan = _Plan()
+    for task, ws in sorted(pairs, key=lambda p: p[0].sort_key):
+        plan.add(task, ws)
+    # Whatever the batch left over (tasks past matching_max_tasks, capacity freed by the points repair)
+    # is filled greedily.
+    if tasks is None:
+        return _plan_queues(state, available, plan)
+    return _plan_greedy(state, tasks, available, plan)
 
-        candidates: list[tuple[tuple[int, int, float, str], str]] = []
-        for worker_id, ws in worker_state.items():
-            if not ws["online"]:
-                continue
-            if ws["status"] == "paused":
-                continue
-            if not _skills_match(ws["skills"], required_skills):
-                continue
-            if ws["used_points"] + estimate_points > ws["capacity_points"]:
-                continue
-            if ws["used_tasks"] + 1 > ws["max_concurrent_tasks"]:
-                continue
 
-            # Rank: lowest load points, then lowest concurrent tasks, then highest reputation, then most recent heartbeat
-            # Use tuple that sorts ascending; for reputation, negate to prefer higher.
-            key = (
-                ws["used_points"],
-                ws["used_tasks"],
-                -ws["reputation"],
-                ws["last_heartbeat"] or "",
-            )
-            candidates.append((key, worker_id))
-
-        if not candidates:
-            skipped_no_worker += 1
+def _skipped_all(state: SchedulerState, plan: _Plan, held: set[tuple[str, str]]) -> dict[str, int]:
+    """
+    Skip counts for a full pass, from the ready counts per repo and per area rather than per task.
+
+    As in `_plan_greedy`, a task counts as area-locked when its area was locked before it came up:
+    by a lease, by a task the plan already `held` when the pass started, or by a planned task ahead of
+    it in priority order. Tasks of the area ahead of the one that took it found no worker.
+    """
+    considered = throttled = area_locked = 0
+    for repo, rs in state.repos.items():
+        n = state.repo_ready.get(repo, 0)
+        considered += n
+        if rs.throttled:
+            throttled += n
+        elif rs.area_locks_enabled:
+            for area in rs.locked_areas:
+                area_locked += state.area_ready.get((repo, area), 0)
+    for (repo, area), taken_at in plan.areas.items():
+        rs = state.repos[repo]
+        if not rs.area_locks_enabled or rs.locked_areas.get(area):
             continue
+        if (repo, area) in held:
+            # The planned task itself is still ready until leased.
+            area_locked += state.area_ready.get((repo, area), 0) - 1
+        else:
+            for key in state.queues_by_area.get((repo, area), ()):
+                queue = state.queues[key]
+                area_locked += len(queue) - bisect.bisect_right(queue, taken_at)
+    return {
+        "skipped_throttle": throttled,
+        "skipped_area_lock": area_locked,
+        "skipped_no_worker": considered - throttled - area_locked - len(plan.pairs),
+    }
 
-        candidates.sort(key=lambda x: x[0])
-        _, best_worker = candidates[0]
 
-        lease_expires = now + timedelta(seconds=config.lease_ttl_seconds)
-        db.lease_task(conn, task_id=task["task_id"], worker_id=best_worker, lease_expires_at=lease_expires)
+def run_scheduling_cycle(conn, *, config: SchedulerConfig, state: SchedulerState | None = None) -> dict[str, int]:
+    """
+    Runs a single scheduling cycle:
+    - Requeues expired leases
+    - Assigns ready tasks to eligible workers using greedy matching, or a min-cost flow over the whole
+      batch when `config.assignment == "matching"`
+
+    With a persistent `state`, only tasks affected by deltas since the last cycle are revisited and a
+    cycle with nothing to do touches the DB not at all. Without one, the state is loaded from `conn`.
+
+    In matching mode the result also carries `greedy_points` (what greedy would have placed),
+    `utilisation_gain_points` (extra estimate points placed over greedy, counted only when the matched
+    plan still places every task greedy placed), `matching_ms` and `matching_fallback` (1 when the
+    solve ran out of budget and greedy was used).
+    """
+    if config.assignment not in ASSIGNMENT_ENGINES:
+        raise ValueError(f"Unknown assignment engine: {config.assignment!r}")
+    if state is None:
+        state = SchedulerState.from_db(conn)
+    elif state.needs_rebuild:
+        state.rebuild(conn)
+
+    now = db.utc_now()
+    requeued = 0
+    if state.lease_expiry_due(now):
+        rows = db.requeue_expired_leases(conn)
+        requeued = len(rows)
+        state.requeued(rows, next_lease_expiry=db.from_ms(db.next_lease_expiry(conn)))
+    elif state.last_verified is None or (now - state.last_verified).total_seconds() >= config.reconcile_seconds:
+        if not state.verify(conn):
+            state.rebuild(conn)
+
+    tasks = state.take_pending()
+    available = {
+        ws.worker_id
+        for ws in state.workers.values()
+        if ws.status != "paused" and ws.is_online(now, config.heartbeat_ttl_seconds)
+    }
+
+    if tasks is None:
+        plan = _plan_queues(state, available, _Plan())
+    else:
+        plan = _plan_greedy(state, tasks, available, _Plan())
+    extra: dict[str, int] = {}
+    if config.assignment == "matching":
+        greedy_points = plan.assigned_points
+        extra = {"greedy_points": greedy_points, "utilisation_gain_points": 0, "matching_ms": 0, "matching_fallback": 0}
+        # Only a task that found no worker can be placed by rearranging the others.
+        if plan.skipped["skipped_no_worker"] and plan.pairs:
+            started = time.perf_counter()
+            matched = _plan_matching(state, tasks, available, config, keep=plan.planned)
+            extra["matching_ms"] = int((time.perf_counter() - started) * 1000)
+            extra["matching_fallback"] = int(matched is None)
+            # Only a plan that keeps everything greedy placed (so no higher-priority task makes way for
+            # bigger ones) and adds points replaces it; ties keep greedy, which honours priority order.
+            if matched is not None and matched.planned >= plan.planned and matched.assigned_points > greedy_points:
+                plan = matched
+                extra["utilisation_gain_points"] = matched.assigned_points - greedy_points
+
+    assigned = 0
+    assigned_points = 0
+    lease_expires = now + timedelta(seconds=config.lease_ttl_seconds)
+    for task, ws in plan.pairs:
+        if not db.lease_task(conn, task_id=task.task_id, worker_id=ws.worker_id, lease_expires_at=lease_expires):
+            # The DB disagrees with the in-memory model; stop and reload on the next cycle.
+            state.mark_diverged()
+            break
         assigned += 1
+        assigned_points += task.estimate_points
 
-        # Update in-memory state for subsequent tasks in this cycle
-        worker_state[best_worker]["used_points"] += estimate_points
-        worker_state[best_worker]["used_tasks"] += 1
-        if cfg["area_locks_enabled"]:
-            area = (task["area"] or "").strip()
-            if area:
-                area_locks.setdefault(repo, set()).add(area)
+        # Update in-memory state for subsequent cycles
+        state.lease(task.task_id, worker_id=ws.worker_id, lease_expires_at=lease_expires)
 
     return {
         "requeued": requeued,
         "assigned": assigned,
-        "skipped_throttle": skipped_throttle,
-        "skipped_area_lock": skipped_area_lock,
-        "skipped_no_worker": skipped_no_worker,
+        "assigned_points": assigned_points,
+        **plan.skipped,
+        **extra,
     }
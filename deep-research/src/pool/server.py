@@ -4,16 +4,21 @@ import argparse
 import threading
 import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Iterator
 
 import uvicorn
-from fastapi import Depends, FastAPI, HTTPException, status
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 
 from . import db
-from .auth import generate_token, hash_token, require_admin, require_bearer_token
+from .auth import TokenCache, generate_token, hash_token, require_admin, require_bearer_token
+from .dashboard import STATUSES as DASHBOARD_STATUSES, DashboardQuery, load_dashboard, render
 from .envfile import load_env
+from .feed import EventFeed, EventFilter, stream
+from .retention import EventArchive, RetentionPolicy, RetentionWorker
 from .models import (
     AdminState,
     HeartbeatRequest,
@@ -22,390 +27,537 @@ from .models import (
     RegisterWorkerResponse,
     RepoCreateRequest,
     RepoCreateResponse,
+    SyncResponse,
+    TaskBatchCreateRequest,
+    TaskBatchCreateResponse,
     TaskCreateRequest,
     TaskCreateResponse,
     TaskStatusUpdateRequest,
     WorkResponse,
 )
-from .scheduler import SchedulerConfig, run_scheduling_cycle
+from .scheduler import ASSIGNMENT_ENGINES, SchedulerConfig, run_scheduling_cycle
+from .state import SchedulerState, TaskState, WorkerState
+from .trigger import LeaseNotifier, SchedulingTrigger
 
 
 class PoolService:
-    def __init__(self, db_path: str, *, scheduler_config: SchedulerConfig) -> None:
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        scheduler_config: SchedulerConfig,
+        cycle_seconds: float = 5.0,
+        debounce_seconds: float = 0.05,
+        event_durability: str = "transaction",
+        event_flush_seconds: float = 1.0,
+        dashboard_max_age_seconds: float = 5.0,
+        archive_dir: str | None = None,
+        retention: RetentionPolicy | None = None,
+        retention_seconds: float = 3600.0,
+    ) -> None:
         self.db_path = db_path
+        self._db = db.ConnectionPool(db_path, event_durability=event_durability, event_flush_interval=event_flush_seconds)
+        # Request handlers reach the database through this (see the *_async methods); the scheduler
+        # thread and direct callers use the pool's writer/reader blocks.
+        self.db = db.AsyncDB(self._db)
         self.scheduler_config = scheduler_config
-        self._lock = threading.Lock()
-
-        with self._lock:
-            conn = db.connect(self.db_path)
+        self._state = SchedulerState()
+        # Transaction bodies apply state deltas before their commit; a failed commit voids them.
+        self._db.rollback_listeners.append(self._state.mark_diverged)
+        self._tokens = TokenCache()
+        self.leases = LeaseNotifier()
+        self.trigger = SchedulingTrigger(self.run_cycle, interval_seconds=cycle_seconds, debounce_seconds=debounce_seconds)
+
+        with self._db.writer() as conn:
             db.init_db(conn)
-            conn.close()
+            self._state.rebuild(conn)
+
+        # Rendered dashboard keyed by (data_version, time bucket); the bucket lets online/offline
+        # flags age out even when nothing is written.
+        self.dashboard_max_age_seconds = dashboard_max_age_seconds
+        self.dashboard_cache_size = 32
+        self._dashboard_lock = threading.Lock()
+        self._dashboard: dict[DashboardQuery, tuple[str, str]] = {}
+        # data_version restarts at 0 with the process; this keeps ETags from before a restart from matching.
+        self._etag_nonce = f"{time.time_ns():x}"
+
+        self.feed = EventFeed(self._db)
+        self._db.event_listeners.append(self.feed.notify)
+
+        # Event retention only runs with an archive to move aged events into.
+        self.archive = EventArchive(archive_dir) if archive_dir else None
+        self.retention = (
+            RetentionWorker(self._db, self.archive, retention or RetentionPolicy(), interval_seconds=retention_seconds)
+            if self.archive is not None
+            else None
+        )
+
+    def start(self) -> None:
+        self.db.start()
+        self.feed.start()
+        self.trigger.start()
+        if self.retention is not None:
+            self.retention.start()
+
+    def stop(self) -> None:
+        if self.retention is not None:
+            self.retention.stop()
+        self.trigger.stop()
+        self.feed.stop()
+        self.db.stop()
+        self._db.close()
 
     def run_cycle(self) -> dict[str, int]:
-        with self._lock:
-            conn = db.connect(self.db_path)
-            try:
-                return run_scheduling_cycle(conn, config=self.scheduler_config)
-            finally:
-                conn.close()
+        with self._db.writer() as conn:
+            result = run_scheduling_cycle(conn, config=self.scheduler_config, state=self._state)
+            changed = self._state.take_lease_changes()
+        # Wake long-polls only after the commit so they read the new leases (requeued ones included).
+        self.leases.bump(changed)
+        return result
+
+    # Each operation is a transaction body taking the writer (or reader) connection, run either in a
+    # blocking writer/reader block or, from request handlers, through `self.db` without holding a thread.
 
     def create_repo(self, repo: str, max_open_prs: int, area_locks_enabled: bool) -> None:
-        with self._lock:
-            conn = db.connect(self.db_path)
-            try:
-                db.upsert_repo(conn, repo=repo, max_open_prs=max_open_prs, area_locks_enabled=area_locks_enabled)
-                db.log_event(conn, event_type="repo.upsert", repo=repo, details={"max_open_prs": max_open_prs, "area_locks_enabled": area_locks_enabled})
-            finally:
-                conn.close()
+        with self._db.writer() as conn:
+            self._create_repo(conn, repo, max_open_prs, area_locks_enabled)
 
-    def register_worker(self, req: RegisterWorkerRequest) -> RegisterWorkerResponse:
-        token = generate_token()
-        token_h = hash_token(token)
-        worker_id = f"w_{uuid.uuid4().hex[:12]}"
+    async def create_repo_async(self, repo: str, max_open_prs: int, area_locks_enabled: bool) -> None:
+        await self.db.write(self._create_repo, repo, max_open_prs, area_locks_enabled)
 
-        with self._lock:
-            conn = db.connect(self.db_path)
-            try:
-                db.insert_worker(
-                    conn,
-                    worker_id=worker_id,
-                    name=req.name,
-                    github_handle=req.github_handle,
-                    skills=req.skills,
-                    capacity_points=req.capacity_points,
-                    max_concurrent_tasks=req.max_concurrent_tasks,
-                    status="idle",
-                    token_hash=token_h,
-                )
-                db.log_event(
-                    conn,
-                    event_type="worker.register",
-                    actor_worker_id=worker_id,
-                    details={"name": req.name, "github_handle": req.github_handle, "skills": req.skills},
-                )
-            finally:
-                conn.close()
+    def _create_repo(self, conn, repo: str, max_open_prs: int, area_locks_enabled: bool) -> None:
+        db.upsert_repo(conn, repo=repo, max_open_prs=max_open_prs, area_locks_enabled=area_locks_enabled)
+        db.log_event(conn, event_type="repo.upsert", repo=repo, details={"max_open_prs": max_open_prs, "area_locks_enabled": area_locks_enabled})
+        self._state.upsert_repo(repo, max_open_prs=max_open_prs, area_locks_enabled=area_locks_enabled)
+
+    def register_worker(self, req: RegisterWorkerRequest) -> RegisterWorkerResponse:
+        token, worker_id = generate_token(), f"w_{uuid.uuid4().hex[:12]}"
+        with self._db.writer() as conn:
+            self._register_worker(conn, worker_id, hash_token(token), req)
+        return RegisterWorkerResponse(worker_id=worker_id, token=token)
 
+    async def register_worker_async(self, req: RegisterWorkerRequest) -> RegisterWorkerResponse:
+        token, worker_id = generate_token(), f"w_{uuid.uuid4().hex[:12]}"
+        await self.db.write(self._register_worker, worker_id, hash_token(token), req)
         return RegisterWorkerResponse(worker_id=worker_id, token=token)
 
+    def _register_worker(self, conn, worker_id: str, token_h: str, req: RegisterWorkerRequest) -> None:
+        db.insert_worker(
+            conn,
+            worker_id=worker_id,
+            name=req.name,
+            github_handle=req.github_handle,
+            skills=req.skills,
+            capacity_points=req.capacity_points,
+            max_concurrent_tasks=req.max_concurrent_tasks,
+            status="idle",
+            token_hash=token_h,
+        )
+        db.log_event(
+            conn,
+            event_type="worker.register",
+            actor_worker_id=worker_id,
+            details={"name": req.name, "github_handle": req.github_handle, "skills": req.skills},
+        )
+        self._state.add_worker(
+            WorkerState(
+                worker_id=worker_id,
+                status="idle",
+                skills=list(req.skills),
+                capacity_points=req.capacity_points,
+                max_concurrent_tasks=req.max_concurrent_tasks,
+            )
+        )
+
     def authenticate_worker(self, bearer_token: str) -> str:
         token_h = hash_token(bearer_token)
-        with self._lock:
-            conn = db.connect(self.db_path)
-            try:
-                row = db.worker_by_token_hash(conn, token_h)
-                if not row:
-                    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid worker token")
-                return str(row["worker_id"])
-            finally:
-                conn.close()
+        worker_id = self._tokens.get(token_h)
+        if worker_id is not None:
+            return worker_id
+        with self._db.reader() as conn:
+            return self._worker_for_token(conn, token_h)
+
+    async def authenticate_worker_async(self, bearer_token: str) -> str:
+        token_h = hash_token(bearer_token)
+        worker_id = self._tokens.get(token_h)
+        if worker_id is not None:
+            return worker_id
+        return await self.db.read(self._worker_for_token, token_h)
+
+    def _worker_for_token(self, conn, token_h: str) -> str:
+        row = db.worker_by_token_hash(conn, token_h)
+        if not row:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid worker token")
+        worker_id = str(row["worker_id"])
+        self._tokens.put(token_h, worker_id)
+        return worker_id
 
     def heartbeat(self, worker_id: str, req: HeartbeatRequest) -> None:
-        with self._lock:
-            conn = db.connect(self.db_path)
-            try:
-                if not db.worker_by_id(conn, worker_id):
-                    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unknown worker")
-                db.update_worker_heartbeat(conn, worker_id=worker_id, status=req.status.value, note=req.note)
-            finally:
-                conn.close()
+        with self._db.writer() as conn:
+            self._record_heartbeat(conn, worker_id, req)
+
+    async def heartbeat_async(self, worker_id: str, req: HeartbeatRequest) -> None:
+        await self.db.write(self._record_heartbeat, worker_id, req)
+
+    def sync(self, worker_id: str, req: HeartbeatRequest) -> SyncResponse:
+        """Heartbeat + current leases in one round trip and one transaction."""
+        with self._db.writer() as conn:
+            return self._sync(conn, worker_id, req)
+
+    async def sync_async(self, worker_id: str, req: HeartbeatRequest) -> SyncResponse:
+        return await self.db.write(self._sync, worker_id, req)
+
+    def _sync(self, conn, worker_id: str, req: HeartbeatRequest) -> SyncResponse:
+        self._record_heartbeat(conn, worker_id, req)
+        version = self.leases.version(worker_id)
+        leases = self._leases(conn, worker_id)
+        return SyncResponse(worker_id=worker_id, server_time=datetime.now(timezone.utc), leases=leases, version=version)
 
     def work_for(self, worker_id: str) -> WorkResponse:
-        with self._lock:
-            conn = db.connect(self.db_path)
-            try:
-                tasks = db.list_tasks_for_worker(conn, worker_id)
-                leases = []
-                for t in tasks:
-                    lease_expires = db.from_iso(t["lease_expires_at"])
-                    if not lease_expires:
-                        # Shouldn't happen, but keep UI stable
-                        lease_expires = db.utc_now()
-                    leases.append(
-                        {
-                            "task_id": t["task_id"],
-                            "repo": t["repo"],
-                            "title": t["title"],
-                            "description": t["description"],
-                            "estimate_points": int(t["estimate_points"]),
-                            "priority": int(t["priority"]),
-                            "area": t["area"],
-                            "tier": int(t["tier"]),
-                            "required_skills": db.json_loads(t["required_skills_json"]) or [],
-                            "lease_expires_at": lease_expires,
-                        }
-                    )
-                return WorkResponse(worker_id=worker_id, leases=leases)
-            finally:
-                conn.close()
+        # Read the version first: a change racing the read only makes the next long-poll return early.
+        version = self.leases.version(worker_id)
+        with self._db.reader() as conn:
+            return WorkResponse(worker_id=worker_id, leases=self._leases(conn, worker_id), version=version)
+
+    async def work_for_async(self, worker_id: str) -> WorkResponse:
+        version = self.leases.version(worker_id)
+        leases = await self.db.read(self._leases, worker_id)
+        return WorkResponse(worker_id=worker_id, leases=leases, version=version)
+
+    def _record_heartbeat(self, conn, worker_id: str, req: HeartbeatRequest) -> None:
+        if not db.worker_by_id(conn, worker_id):
+            self._tokens.invalidate_worker(worker_id)
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unknown worker")
+        db.update_worker_heartbeat(conn, worker_id=worker_id, status=req.status.value, note=req.note)
+        self._state.worker_heartbeat(
+            worker_id,
+            status=req.status.value,
+            at=db.utc_now(),
+            ttl_seconds=self.scheduler_config.heartbeat_ttl_seconds,
+        )
+
+    def _leases(self, conn, worker_id: str) -> list[dict[str, Any]]:
+        leases = []
+        for t in db.list_tasks_for_worker(conn, worker_id):
+            lease_expires = db.from_ms(t["lease_expires_ms"])
+            if not lease_expires:
+                # Shouldn't happen, but keep UI stable
+                lease_expires = db.utc_now()
+            leases.append(
+                {
+                    "task_id": t["task_id"],
+                    "repo": t["repo"],
+                    "title": t["title"],
+                    "description": t["description"],
+                    "estimate_points": int(t["estimate_points"]),
+                    "priority": int(t["priority"]),
+                    "area": t["area"],
+                    "tier": int(t["tier"]),
+                    "required_skills": db.json_loads(t["required_skills_json"]) or [],
+                    "lease_expires_at": lease_expires,
+                }
+            )
+        return leases
 
     def add_task(self, req: TaskCreateRequest) -> TaskCreateResponse:
-        task_id = f"t_{uuid.uuid4().hex[:12]}"
-        with self._lock:
-            conn = db.connect(self.db_path)
-            try:
-                if not db.repo_row(conn, req.repo):
-                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown repo: {req.repo}")
-                db.insert_task(
-                    conn,
+        task_id = self.add_tasks([req])[0]
+        return TaskCreateResponse(task_id=task_id)
+
+    async def add_task_async(self, req: TaskCreateRequest) -> TaskCreateResponse:
+        task_id = (await self.add_tasks_async([req]))[0]
+        return TaskCreateResponse(task_id=task_id)
+
+    def add_tasks(self, reqs: list[TaskCreateRequest]) -> list[str]:
+        """Creates all tasks in one transaction; fails as a whole if any repo is unknown."""
+        with self._db.writer() as conn:
+            return self._add_tasks(conn, reqs)
+
+    async def add_tasks_async(self, reqs: list[TaskCreateRequest]) -> list[str]:
+        return await self.db.write(self._add_tasks, reqs)
+
+    def _add_tasks(self, conn, reqs: list[TaskCreateRequest]) -> list[str]:
+        task_ids = [f"t_{uuid.uuid4().hex[:12]}" for _ in reqs]
+        unknown = sorted(r for r in {req.repo for req in reqs} if not db.repo_row(conn, r))
+        if unknown:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown repo: {', '.join(unknown)}")
+        db.insert_tasks(
+            conn,
+            (
+                {
+                    "task_id": task_id,
+                    "repo": req.repo,
+                    "title": req.title,
+                    "description": req.description,
+                    "estimate_points": req.estimate_points,
+                    "priority": req.priority,
+                    "required_skills": req.required_skills,
+                    "area": req.area,
+                    "tier": req.tier,
+                }
+                for task_id, req in zip(task_ids, reqs)
+            ),
+        )
+        for task_id, req in zip(task_ids, reqs):
+            db.log_event(conn, event_type="task.create", repo=req.repo, task_id=task_id, details=req.model_dump())
+            self._state.add_task(
+                TaskState(
                     task_id=task_id,
                     repo=req.repo,
-                    title=req.title,
-                    description=req.description,
-                    estimate_points=req.estimate_points,
                     priority=req.priority,
-                    required_skills=req.required_skills,
-                    area=req.area,
-                    tier=req.tier,
+                    estimate_points=req.estimate_points,
+                    required_skills=list(req.required_skills),
+                    area=(req.area or "").strip(),
                 )
-                db.log_event(conn, event_type="task.create", repo=req.repo, task_id=task_id, details=req.model_dump())
-            finally:
-                conn.close()
-        return TaskCreateResponse(task_id=task_id)
+            )
+        return task_ids
 
     def update_task_status(self, *, worker_id: str, task_id: str, req: TaskStatusUpdateRequest) -> None:
-        with self._lock:
-            conn = db.connect(self.db_path)
-            try:
-                row = conn.execute("SELECT * FROM tasks WHERE task_id=?", (task_id,)).fetchone()
-                if not row:
-                    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
-                if row["assigned_worker_id"] != worker_id:
-                    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Task not assigned to this worker")
-
-                # Allow limited transitions
-                new_status = req.status
-                if new_status not in {"in_progress", "blocked", "pr_opened", "merged"}:
-                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid status")
-
-                db.update_task_status(
-                    conn,
-                    task_id=task_id,
-                    actor_worker_id=worker_id,
-                    status=new_status,
-                    message=req.message,
-                    artifact=(req.artifact.model_dump() if req.artifact else None),
-                )
-            finally:
-                conn.close()
+        with self._db.writer() as conn:
+            changed = self._update_task_status(conn, worker_id, task_id, req)
+        self.leases.bump(changed)
+
+    async def update_task_status_async(self, *, worker_id: str, task_id: str, req: TaskStatusUpdateRequest) -> None:
+        changed = await self.db.write(self._update_task_status, worker_id, task_id, req)
+        # Resolved after the commit, so woken long-polls read the new lease set.
+        self.leases.bump(changed)
+
+    def _update_task_status(self, conn, worker_id: str, task_id: str, req: TaskStatusUpdateRequest) -> set[str]:
+        row = conn.execute("SELECT * FROM tasks WHERE task_id=?", (task_id,)).fetchone()
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+        if row["assigned_worker_id"] != worker_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Task not assigned to this worker")
+
+        # Allow limited transitions
+        new_status = req.status
+        if new_status not in {"in_progress", "blocked", "pr_opened", "merged"}:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid status")
+
+        db.update_task_status(
+            conn,
+            task_id=task_id,
+            actor_worker_id=worker_id,
+            status=new_status,
+            message=req.message,
+            artifact=(req.artifact.model_dump() if req.artifact else None),
+        )
+        self._state.task_status_changed(row, new_status)
+        return self._state.take_lease_changes()
 
     def admin_state(self) -> AdminState:
-        with self._lock:
-            conn = db.connect(self.db_path)
-            try:
-                counts = db.counts_by_status(conn)
-                workers = db.list_workers(conn)
-                now = db.utc_now()
-                online = 0
-                for w in workers:
-                    hb = w["last_heartbeat"]
-                    if not hb:
-                        continue
-                    try:
-                        ts = datetime.fromisoformat(hb)
-                        if ts.tzinfo is None:
-                            ts = ts.replace(tzinfo=timezone.utc)
-                    except ValueError:
-                        continue
-                    if (now - ts).total_seconds() <= self.scheduler_config.heartbeat_ttl_seconds:
-                        online += 1
-                return AdminState(
-                    workers_online=online,
-                    tasks_ready=counts.get("ready", 0),
-                    tasks_leased=counts.get("leased", 0),
-                    tasks_in_progress=counts.get("in_progress", 0),
-                    tasks_pr_opened=counts.get("pr_opened", 0),
-                    tasks_blocked=counts.get("blocked", 0),
-                    tasks_merged=counts.get("merged", 0),
-                )
-            finally:
-                conn.close()
-
-    def dashboard_html(self) -> str:
-        with self._lock:
-            conn = db.connect(self.db_path)
-            try:
-                counts = db.counts_by_status(conn)
-                repos = conn.execute("SELECT * FROM repos ORDER BY repo").fetchall()
-                workers = conn.execute("SELECT * FROM workers ORDER BY created_at").fetchall()
-                tasks = conn.execute("SELECT * FROM tasks ORDER BY updated_at DESC LIMIT 50").fetchall()
-                events = conn.execute("SELECT * FROM events ORDER BY id DESC LIMIT 50").fetchall()
-                open_prs = {r["repo"]: db.count_open_prs(conn, r["repo"]) for r in repos}
-            finally:
-                conn.close()
-
-        def esc(s: Any) -> str:
-            return (str(s) if s is not None else "").replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-
-        now = datetime.now(timezone.utc).isoformat()
-        parts = []
-        parts.append("<html><head><meta charset='utf-8'/>")
-        parts.append("<meta http-equiv='refresh' content='2'/>")
-        parts.append(
-            "<style>"
-            "body{font-family:ui-sans-serif,system-ui,Segoe UI,Roboto,Arial;padding:16px}"
-            "table{border-collapse:collapse}"
-            "td,th{border:1px solid #ddd;padding:6px 8px}"
-            "th{background:#f6f6f6}"
-            "code{background:#f2f2f2;padding:2px 4px;border-radius:4px}"
-            "tr.offline{opacity:0.55}"
-            "tr.throttled{background:#fff4cc}"
-            "</style>"
+        with self._db.reader() as conn:
+            return self._admin_state(conn)
+
+    async def admin_state_async(self) -> AdminState:
+        return await self.db.read(self._admin_state)
+
+    def _admin_state(self, conn) -> AdminState:
+        counts = db.counts_by_status(conn)
+        since_ms = db.to_ms(db.utc_now()) - self.scheduler_config.heartbeat_ttl_seconds * 1000
+        online = db.count_online_workers(conn, since_ms=since_ms)
+        return AdminState(
+            workers_online=online,
+            tasks_ready=counts.get("ready", 0),
+            tasks_leased=counts.get("leased", 0),
+            tasks_in_progress=counts.get("in_progress", 0),
+            tasks_pr_opened=counts.get("pr_opened", 0),
+            tasks_blocked=counts.get("blocked", 0),
+            tasks_merged=counts.get("merged", 0),
         )
-        parts.append(f"<title>OWP Pool Dashboard</title></head><body>")
-        parts.append(f"<h1>OWP Pool Dashboard</h1><p><b>Server time</b>: <code>{esc(now)}</code></p>")
-        parts.append("<h2>Counts</h2><table><tr><th>Status</th><th>Count</th></tr>")
-        for k in ["ready", "leased", "in_progress", "blocked", "pr_opened", "merged"]:
-            parts.append(f"<tr><td>{esc(k)}</td><td>{esc(counts.get(k,0))}</td></tr>")
-        parts.append("</table>")
-
-        parts.append("<h2>Repos</h2><table><tr><th>Repo</th><th>max_open_prs</th><th>area_locks</th><th>open_prs</th><th>throttled</th></tr>")
-        for r in repos:
-            repo = str(r["repo"])
-            max_open = int(r["max_open_prs"])
-            open_pr = int(open_prs.get(repo, 0))
-            throttled = max_open == 0 or open_pr >= max_open
-            row_class = " class='throttled'" if throttled else ""
-            parts.append(
-                f"<tr{row_class}>"
-                f"<td>{esc(repo)}</td>"
-                f"<td>{esc(max_open)}</td>"
-                f"<td>{'on' if int(r['area_locks_enabled']) else 'off'}</td>"
-                f"<td>{esc(open_pr)}</td>"
-                f"<td>{'yes' if throttled else 'no'}</td>"
-                "</tr>"
-            )
-        parts.append("</table>")
 
-        parts.append("<h2>Workers</h2><table><tr><th>worker_id</th><th>name</th><th>online</th><th>skills</th><th>capacity</th><th>max_conc</th><th>status</th><th>last_heartbeat</th><th>load(pts/tasks)</th></tr>")
-        conn2 = db.connect(self.db_path)
-        try:
-            now_dt = db.utc_now()
-            for w in workers:
-                pts, n = db.worker_load(conn2, w["worker_id"])
-                hb = w["last_heartbeat"]
-                online = False
-                if hb:
-                    try:
-                        ts = datetime.fromisoformat(hb)
-                        if ts.tzinfo is None:
-                            ts = ts.replace(tzinfo=timezone.utc)
-                        online = (now_dt - ts).total_seconds() <= self.scheduler_config.heartbeat_ttl_seconds
-                    except ValueError:
-                        online = False
-                row_class = "" if online else " class='offline'"
-                parts.append(
-                    f"<tr{row_class}>"
-                    f"<td><code>{esc(w['worker_id'])}</code></td>"
-                    f"<td>{esc(w['name'])}</td>"
-                    f"<td>{'yes' if online else 'no'}</td>"
-                    f"<td>{esc(','.join(db.json_loads(w['skills_json']) or []))}</td>"
-                    f"<td>{esc(w['capacity_points'])}</td>"
-                    f"<td>{esc(w['max_concurrent_tasks'])}</td>"
-                    f"<td>{esc(w['status'])}</td>"
-                    f"<td>{esc(w['last_heartbeat'])}</td>"
-                    f"<td>{esc(pts)}/{esc(n)}</td>"
-                    "</tr>"
-                )
-        finally:
-            conn2.close()
-        parts.append("</table>")
-
-        parts.append("<h2>Recent Tasks</h2><table><tr><th>task_id</th><th>repo</th><th>status</th><th>title</th><th>assignee</th><th>updated</th><th>area</th><th>artifact</th></tr>")
-        for t in tasks:
-            art = db.json_loads(t["artifact_json"]) or {}
-            parts.append(
-                "<tr>"
-                f"<td><code>{esc(t['task_id'])}</code></td>"
-                f"<td>{esc(t['repo'])}</td>"
-                f"<td>{esc(t['status'])}</td>"
-                f"<td>{esc(t['title'])}</td>"
-                f"<td><code>{esc(t['assigned_worker_id'])}</code></td>"
-                f"<td>{esc(t['updated_at'])}</td>"
-                f"<td>{esc(t['area'])}</td>"
-                f"<td>{esc(art.get('pr_url') or art.get('commit_sha') or '')}</td>"
-                "</tr>"
-            )
-        parts.append("</table>")
-
-        parts.append("<h2>Recent Events</h2><table><tr><th>ts</th><th>type</th><th>actor</th><th>task</th><th>details</th></tr>")
-        for e in events:
-            parts.append(
-                "<tr>"
-                f"<td>{esc(e['ts'])}</td>"
-                f"<td>{esc(e['type'])}</td>"
-                f"<td><code>{esc(e['actor_worker_id'])}</code></td>"
-                f"<td><code>{esc(e['task_id'])}</code></td>"
-                f"<td><code>{esc(e['details_json'])}</code></td>"
-                "</tr>"
-            )
-        parts.append("</table>")
-
-        parts.append("</body></html>")
-        return "".join(parts)
+    def dashboard_etag(self, query: DashboardQuery) -> str:
+        bucket = int(time.time() // self.dashboard_max_age_seconds) if self.dashboard_max_age_seconds > 0 else 0
+        return f'"{self._etag_nonce}.{self._db.data_version}.{bucket}.{abs(hash(query)):x}"'
+
+    def dashboard(self, query: DashboardQuery) -> tuple[str, Iterator[str]]:
+        """
+        (etag, html chunks). A view is re-rendered only when the data version or time bucket moved;
+        a fresh render streams straight from the template and is cached once it has been fully sent.
+        """
+        etag = self.dashboard_etag(query)
+        cached = self._dashboard.get(query)
+        if cached is not None and cached[0] == etag:
+            return etag, iter((cached[1],))
+        with self._db.reader() as conn:
+            data = load_dashboard(conn, query, heartbeat_ttl_seconds=self.scheduler_config.heartbeat_ttl_seconds)
+
+        def chunks() -> Iterator[str]:
+            parts = []
+            for part in render(data, etag=etag):
+                parts.append(part)
+                yield part
+            with self._dashboard_lock:
+                self._dashboard.pop(query, None)
+                self._dashboard[query] = (etag, "".join(parts))
+                while len(self._dashboard) > self.dashboard_cache_size:
+                    del self._dashboard[next(iter(self._dashboard))]
+
+        return etag, chunks()
 
 
 def create_app(service: PoolService) -> FastAPI:
-    app = FastAPI(title="OWP Pool", version="0.1.0")
+    @asynccontextmanager
+    async def lifespan(_: FastAPI):
+        service.start()
+        try:
+            yield
+        finally:
+            service.stop()
+
+    app = FastAPI(title="OWP Pool", version="0.1.0", lifespan=lifespan)
 
     @app.get("/", response_class=HTMLResponse)
-    def dashboard() -> str:
-        return service.dashboard_html()
+    def dashboard(
+        repo: str | None = Query(default=None),
+        task_status: str | None = Query(default=None, alias="status"),
+        online: str | None = Query(default=None, pattern="^(yes|no)?$"),
+        repos_page: int = Query(default=1, ge=1),
+        workers_page: int = Query(default=1, ge=1),
+        tasks_page: int = Query(default=1, ge=1),
+        events_before: int | None = Query(default=None, ge=1),
+        page_size: int = Query(default=50, ge=1, le=500),
+        if_none_match: str | None = Header(default=None),
+    ) -> Response:
+        if task_status and task_status not in DASHBOARD_STATUSES:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid status")
+        query = DashboardQuery(
+            repo=repo or None,
+            status=task_status or None,
+            online={"yes": True, "no": False}.get(online or ""),
+            repos_page=repos_page,
+            workers_page=workers_page,
+            tasks_page=tasks_page,
+            events_before=events_before,
+            page_size=page_size,
+        )
+        # Conditional refreshes are answered from the version counter without touching SQLite.
+        etag = service.dashboard_etag(query)
+        if if_none_match and etag in {t.strip() for t in if_none_match.split(",")}:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        etag, chunks = service.dashboard(query)
+        return StreamingResponse(chunks, media_type="text/html; charset=utf-8", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    async def request_cycle() -> int:
+        # Without the scheduler thread (app driven without its lifespan) the cycle runs inline; keep it off the loop.
+        if service.trigger.running:
+            return service.trigger.request()
+        return await run_in_threadpool(service.trigger.request)
+
+    # Worker and admin routes are async: they wait on the service's DB queue and on futures, not on a
+    # threadpool thread, so a burst of requests does not queue behind the threadpool size.
 
     @app.get("/healthz")
-    def healthz() -> dict[str, Any]:
+    async def healthz() -> dict[str, Any]:
         return {"ok": True}
 
     @app.post("/v1/workers/register", response_model=RegisterWorkerResponse)
-    def register_worker(req: RegisterWorkerRequest) -> RegisterWorkerResponse:
-        return service.register_worker(req)
+    async def register_worker(req: RegisterWorkerRequest) -> RegisterWorkerResponse:
+        return await service.register_worker_async(req)
 
     @app.post("/v1/workers/heartbeat", response_model=HeartbeatResponse)
-    def heartbeat(req: HeartbeatRequest, token: str = Depends(require_bearer_token)) -> HeartbeatResponse:
-        worker_id = service.authenticate_worker(token)
-        service.heartbeat(worker_id, req)
-        service.run_cycle()
+    async def heartbeat(req: HeartbeatRequest, token: str = Depends(require_bearer_token)) -> HeartbeatResponse:
+        worker_id = await service.authenticate_worker_async(token)
+        await service.heartbeat_async(worker_id, req)
+        await request_cycle()
         return HeartbeatResponse(server_time=datetime.now(timezone.utc))
 
+    @app.post("/v1/workers/sync", response_model=SyncResponse)
+    async def sync(
+        req: HeartbeatRequest,
+        token: str = Depends(require_bearer_token),
+        cycle_wait: float = Query(default=0.0, ge=0.0, le=10.0, description="Seconds to wait for the pending scheduling cycle"),
+    ) -> SyncResponse:
+        worker_id = await service.authenticate_worker_async(token)
+        resp = await service.sync_async(worker_id, req)
+        generation = await request_cycle()
+        if cycle_wait > 0 and await service.trigger.wait_async(generation, cycle_wait):
+            # Pick up leases the cycle just assigned (read-only snapshot).
+            work = await service.work_for_async(worker_id)
+            resp.leases, resp.version = work.leases, work.version
+        return resp
+
     @app.get("/v1/work", response_model=WorkResponse)
-    def work(token: str = Depends(require_bearer_token)) -> WorkResponse:
-        worker_id = service.authenticate_worker(token)
-        service.run_cycle()
-        return service.work_for(worker_id)
+    async def work(
+        token: str = Depends(require_bearer_token),
+        cycle_wait: float = Query(default=0.0, ge=0.0, le=10.0, description="Seconds to wait for the pending scheduling cycle"),
+        wait: float = Query(default=0.0, ge=0.0, le=60.0, description="Long-poll: seconds to wait for the lease set to change"),
+        since: int | None = Query(default=None, description="Lease version the worker already has (from a previous response)"),
+    ) -> WorkResponse:
+        worker_id = await service.authenticate_worker_async(token)
+        generation = await request_cycle()
+        if cycle_wait > 0:
+            await service.trigger.wait_async(generation, cycle_wait)
+        if wait > 0 and since is not None:
+            # Parks a future on the event loop; no thread or DB connection is held while waiting.
+            await service.leases.wait(worker_id, since, wait)
+        return await service.work_for_async(worker_id)
+
+    @app.get("/v1/events")
+    async def events(
+        type: list[str] | None = Query(default=None, description="Event type; repeat for several"),
+        repo: str | None = Query(default=None),
+        task_id: str | None = Query(default=None),
+        actor: str | None = Query(default=None, description="Actor worker_id"),
+        last_event_id: int | None = Query(default=None, ge=0, description="Resume after this event id"),
+        last_event_id_header: str | None = Header(default=None, alias="Last-Event-ID"),
+    ) -> StreamingResponse:
+        if last_event_id is None and last_event_id_header:
+            try:
+                last_event_id = int(last_event_id_header)
+            except ValueError:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Last-Event-ID")
+        event_filter = EventFilter(types=frozenset(type or ()), repo=repo, task_id=task_id, actor_worker_id=actor)
+        sub = service.feed.subscribe(event_filter, last_event_id=last_event_id)
+        return StreamingResponse(
+            stream(service.feed, sub),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
 
     @app.post("/v1/tasks/{task_id}/status")
-    def task_status(task_id: str, req: TaskStatusUpdateRequest, token: str = Depends(require_bearer_token)) -> JSONResponse:
-        worker_id = service.authenticate_worker(token)
-        service.update_task_status(worker_id=worker_id, task_id=task_id, req=req)
-        service.run_cycle()
+    async def task_status(task_id: str, req: TaskStatusUpdateRequest, token: str = Depends(require_bearer_token)) -> JSONResponse:
+        worker_id = await service.authenticate_worker_async(token)
+        await service.update_task_status_async(worker_id=worker_id, task_id=task_id, req=req)
+        await request_cycle()
         return JSONResponse({"ok": True})
 
     @app.post("/v1/admin/repos", dependencies=[Depends(require_admin)], response_model=RepoCreateResponse)
-    def admin_create_repo(req: RepoCreateRequest) -> RepoCreateResponse:
-        service.create_repo(req.repo, req.max_open_prs, req.area_locks_enabled)
+    async def admin_create_repo(req: RepoCreateRequest) -> RepoCreateResponse:
+        await service.create_repo_async(req.repo, req.max_open_prs, req.area_locks_enabled)
         return RepoCreateResponse(repo=req.repo)
 
     @app.post("/v1/admin/tasks", dependencies=[Depends(require_admin)], response_model=TaskCreateResponse)
-    def admin_create_task(req: TaskCreateRequest) -> TaskCreateResponse:
-        return service.add_task(req)
+    async def admin_create_task(req: TaskCreateRequest) -> TaskCreateResponse:
+        return await service.add_task_async(req)
+
+    @app.post("/v1/admin/tasks:batch", dependencies=[Depends(require_admin)], response_model=TaskBatchCreateResponse)
+    async def admin_create_tasks(req: TaskBatchCreateRequest) -> TaskBatchCreateResponse:
+        return TaskBatchCreateResponse(task_ids=await service.add_tasks_async(req.tasks))
+
+    # Sync on purpose: the archive is read from files, so FastAPI runs this in its threadpool.
+    @app.get("/v1/admin/events/archive", dependencies=[Depends(require_admin)])
+    def admin_event_archive(
+        start: datetime = Query(..., description="Inclusive lower bound on event ts"),
+        end: datetime = Query(..., description="Exclusive upper bound on event ts"),
+        type: list[str] | None = Query(default=None),
+        repo: str | None = Query(default=None),
+        task_id: str | None = Query(default=None),
+        actor: str | None = Query(default=None),
+        limit: int = Query(default=1000, ge=1, le=10000),
+    ) -> dict[str, Any]:
+        if service.archive is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event archive not configured")
+        event_filter = EventFilter(types=frozenset(type or ()), repo=repo, task_id=task_id, actor_worker_id=actor)
+        events = list(service.archive.read(start, end, event_filter=event_filter, limit=limit))
+        return {"events": events}
 
     @app.get("/v1/admin/state", dependencies=[Depends(require_admin)], response_model=AdminState)
-    def admin_state() -> AdminState:
-        return service.admin_state()
+    async def admin_state() -> AdminState:
+        return await service.admin_state_async()
 
     return app
 
 
-def _scheduler_loop(service: PoolService, *, interval_seconds: int, stop_event: threading.Event) -> None:
-    while not stop_event.is_set():
-        try:
-            service.run_cycle()
-        except Exception:
-            # Keep the loop alive; details are visible in logs when running uvicorn
-            pass
-        stop_event.wait(interval_seconds)
-
-
 def main() -> None:
     load_env()
     parser = argparse.ArgumentParser(prog="poold")
@@ -415,15 +567,55 @@ def main() -> None:
     parser.add_argument("--lease-ttl", default=30 * 60, type=int, help="Lease TTL seconds")
     parser.add_argument("--heartbeat-ttl", default=90, type=int, help="Worker online TTL seconds")
     parser.add_argument("--cycle", default=5, type=int, help="Scheduler cycle seconds")
+    parser.add_argument(
+        "--assignment",
+        default="greedy",
+        choices=ASSIGNMENT_ENGINES,
+        help="greedy: priority order, least-loaded worker; matching: min-cost flow over each cycle's batch",
+    )
+    parser.add_argument("--matching-budget-ms", default=500, type=int, help="Time budget for a matching solve")
+    parser.add_argument("--debounce-ms", default=50, type=int, help="Window in which scheduling requests share one cycle")
+    parser.add_argument(
+        "--event-durability",
+        default="transaction",
+        choices=db.EVENT_DURABILITY_MODES,
+        help="transaction: events commit with their state change; deferred: heartbeat events are batched",
+    )
+    parser.add_argument("--event-flush-ms", default=1000, type=int, help="Max delay for deferred events")
+    parser.add_argument("--archive-dir", default=None, help="Move aged events into daily gzip NDJSON files here")
+    parser.add_argument(
+        "--event-ttl",
+        action="append",
+        default=[],
+        metavar="TYPE=DURATION",
+        help="Event retention, e.g. worker.heartbeat=1d or default=90d (repeatable; needs --archive-dir)",
+    )
+    parser.add_argument("--retention-every", default=3600, type=int, help="Seconds between retention runs")
     args = parser.parse_args()
 
-    service = PoolService(args.db, scheduler_config=SchedulerConfig(lease_ttl_seconds=args.lease_ttl, heartbeat_ttl_seconds=args.heartbeat_ttl))
+    try:
+        retention = RetentionPolicy.parse(args.event_ttl)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    service = PoolService(
+        args.db,
+        scheduler_config=SchedulerConfig(
+            lease_ttl_seconds=args.lease_ttl,
+            heartbeat_ttl_seconds=args.heartbeat_ttl,
+            assignment=args.assignment,
+            matching_budget_ms=args.matching_budget_ms,
+        ),
+        cycle_seconds=args.cycle,
+        debounce_seconds=args.debounce_ms / 1000,
+        event_durability=args.event_durability,
+        event_flush_seconds=args.event_flush_ms / 1000,
+        archive_dir=args.archive_dir,
+        retention=retention,
+        retention_seconds=args.retention_every,
+    )
     app = create_app(service)
 
-    stop_event = threading.Event()
-    t = threading.Thread(target=_scheduler_loop, args=(service,), kwargs={"interval_seconds": args.cycle, "stop_event": stop_event}, daemon=True)
-    t.start()
-
     uvicorn.run(app, host=args.host, port=args.port, log_level="info")
 
 
@@ -0,0 +1,427 @@
+from __future__ import annotations
+
+import bisect
+import heapq
+import sqlite3
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Iterable, Mapping
+
+from . import db
+
+
+# Statuses that hold worker capacity and lock their area.
+LOAD_STATUSES = frozenset({"leased", "in_progress"})
+
+# A ready queue holds the tasks of one repo and area that need the same skills and have the same
+# estimate: (repo, area, required_mask, estimate_points). Such tasks are interchangeable to every
+# scheduling rule, so the scheduler can skip or give up on a whole queue after looking at its head.
+QueueKey = tuple[str, str, int, int]
+
+
+def _skill_list(value: Any) -> list[str]:
+    if isinstance(value, str):
+        value = db.json_loads(value)
+    if not value:
+        return []
+    return [str(x) for x in value]
+
+
+class SkillIndex:
+    """
+    Interns normalized skill tags to bit positions so skill sets become ints.
+
+    A worker can take a task when `task_mask & ~worker_mask == 0`. Bits are never reused, so masks stay
+    valid for the life of the index.
+    """
+
+    def __init__(self) -> None:
+        self._bits: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._bits)
+
+    def bit(self, skill: str) -> int:
+        bit = self._bits.get(skill)
+        if bit is None:
+            bit = 1 << len(self._bits)
+            self._bits[skill] = bit
+        return bit
+
+    def mask(self, skills: Iterable[str]) -> int:
+        mask = 0
+        for s in skills:
+            s = s.strip().lower()
+            if s:
+                mask |= self.bit(s)
+        return mask
+
+
+@dataclass
+class RepoState:
+    max_open_prs: int
+    area_locks_enabled: bool
+    open_prs: int = 0
+    locked_areas: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def throttled(self) -> bool:
+        return self.max_open_prs == 0 or self.open_prs >= self.max_open_prs
+
+
+@dataclass
+class WorkerState:
+    worker_id: str
+    status: str
+    skills: list[str]
+    capacity_points: int
+    max_concurrent_tasks: int
+    reputation: float = 0.0
+    last_heartbeat: str | None = None
+    heartbeat_at: datetime | None = None
+    used_points: int = 0
+    used_tasks: int = 0
+    skill_mask: int = 0
+
+    @staticmethod
+    def from_row(row: Mapping[str, Any]) -> "WorkerState":
+        return WorkerState(
+            worker_id=str(row["worker_id"]),
+            status=str(row["status"]),
+            skills=_skill_list(row["skills_json"]),
+            capacity_points=int(row["capacity_points"]),
+            max_concurrent_tasks=int(row["max_concurrent_tasks"]),
+            reputation=float(row["reputation"]),
+            last_heartbeat=row["last_heartbeat"],
+            heartbeat_at=db.from_ms(row["last_heartbeat_ms"]),
+        )
+
+    def is_online(self, now: datetime, ttl_seconds: int) -> bool:
+        if self.heartbeat_at is None:
+            return False
+        return (now - self.heartbeat_at).total_seconds() <= ttl_seconds
+
+
+@dataclass
+class TaskState:
+    """A ready task as the scheduler sees it."""
+
+    task_id: str
+    repo: str
+    priority: int
+    estimate_points: int
+    required_skills: list[str]
+    area: str = ""
+    required_mask: int = 0
+
+    @staticmethod
+    def from_row(row: Mapping[str, Any]) -> "TaskState":
+        return TaskState(
+            task_id=str(row["task_id"]),
+            repo=str(row["repo"]),
+            priority=int(row["priority"]),
+            estimate_points=int(row["estimate_points"]),
+            required_skills=_skill_list(row["required_skills_json"]),
+            area=(row["area"] or "").strip(),
+        )
+
+    @property
+    def sort_key(self) -> tuple[int, int, str]:
+        # Same order as db.list_ready_tasks: priority DESC, estimate_points ASC, task_id ASC
+        return (-self.priority, self.estimate_points, self.task_id)
+
+    @property
+    def queue_key(self) -> QueueKey:
+        return (self.repo, self.area, self.required_mask, self.estimate_points)
+
+
+class SchedulerState:
+    """
+    In-process scheduler model that survives across cycles.
+
+    It is built from the DB once (startup, or after a detected divergence) and then kept current by
+    deltas applied by PoolService as repos, workers and tasks change. Each delta records whether it can
+    only affect the tasks it touched (new ready tasks) or may unblock any ready task (capacity freed,
+    worker came online, throttle lifted), so a cycle only revisits what changed. Ready tasks live in
+    per-QueueKey priority queues, so a full pass looks at queue heads rather than at every task.
+
+    Not thread-safe: callers serialize access by going through the pool's writer lock (PoolService
+    only touches it inside `ConnectionPool.writer()`).
+    """
+
+    def __init__(self) -> None:
+        self.skills = SkillIndex()
+        self.repos: dict[str, RepoState] = {}
+        self.workers: dict[str, WorkerState] = {}
+        self.ready: dict[str, TaskState] = {}
+        # Ready tasks as sort keys, best first, partitioned by QueueKey; the queues indexed by skill
+        # signature and repo and by (repo, area); and ready counts per repo and per (repo, area), so
+        # whole repos and areas are counted or skipped without visiting their tasks.
+        self.queues: dict[QueueKey, list[tuple[int, int, str]]] = {}
+        self.queues_by_mask: dict[int, dict[str, set[QueueKey]]] = {}
+        self.queues_by_area: dict[tuple[str, str], set[QueueKey]] = {}
+        self.repo_ready: Counter[str] = Counter()
+        self.area_ready: Counter[tuple[str, str]] = Counter()
+        self.next_lease_expiry: datetime | None = None
+        self.needs_rebuild = True
+        self.last_verified: datetime | None = None
+        self._full_pass = True
+        self._pending: set[str] = set()
+        # required-skill signature -> workers holding every skill in it
+        self._candidates: dict[int, list[WorkerState]] = {}
+        # workers whose lease set changed since the last take_lease_changes()
+        self._lease_changes: set[str] = set()
+
+    @classmethod
+    def from_db(cls, conn: sqlite3.Connection) -> "SchedulerState":
+        state = cls()
+        state.rebuild(conn)
+        return state
+
+    def rebuild(self, conn: sqlite3.Connection) -> None:
+        snapshot = db.load_scheduler_snapshot(conn)
+
+        self.repos = {}
+        for r, row in snapshot.repos.items():
+            locked: Counter[str] = Counter()
+            for area, n in snapshot.locked_areas.get(r, {}).items():
+                if area.strip():
+                    locked[area.strip()] += n
+            self.repos[r] = RepoState(
+                max_open_prs=int(row["max_open_prs"]),
+                area_locks_enabled=bool(int(row["area_locks_enabled"])),
+                open_prs=snapshot.open_prs.get(r, 0),
+                locked_areas=locked,
+            )
+
+        self.workers = {}
+        self._candidates = {}
+        for row in snapshot.workers:
+            ws = WorkerState.from_row(row)
+            ws.used_points, ws.used_tasks = snapshot.worker_loads.get(ws.worker_id, (0, 0))
+            ws.skill_mask = self.skills.mask(ws.skills)
+            self.workers[ws.worker_id] = ws
+
+        self.ready = {}
+        self.queues = {}
+        self.queues_by_mask = {}
+        self.queues_by_area = {}
+        self.repo_ready = Counter()
+        self.area_ready = Counter()
+        for row in snapshot.ready_tasks:
+            task = TaskState.from_row(row)
+            task.required_mask = self.skills.mask(task.required_skills)
+            self.ready[task.task_id] = task
+            key = task.queue_key
+            queue = self.queues.get(key)
+            if queue is None:
+                queue = self.queues[key] = []
+                self.queues_by_mask.setdefault(task.required_mask, {}).setdefault(task.repo, set()).add(key)
+                self.queues_by_area.setdefault((task.repo, task.area), set()).add(key)
+            queue.append(task.sort_key)
+            self.repo_ready[task.repo] += 1
+            self.area_ready[(task.repo, task.area)] += 1
+        for queue in self.queues.values():
+            queue.sort()
+
+        self.next_lease_expiry = db.from_ms(db.next_lease_expiry(conn))
+        self.needs_rebuild = False
+        self.last_verified = db.utc_now()
+        self._full_pass = True
+        self._pending.clear()
+
+    def verify(self, conn: sqlite3.Connection) -> bool:
+        """Cheap consistency probe against the DB; flags a rebuild on mismatch."""
+        self.last_verified = db.utc_now()
+        n_ready = db.counts_by_status(conn).get("ready", 0)
+        n_workers = int(conn.execute("SELECT COUNT(*) FROM workers").fetchone()[0])
+        if n_ready != len(self.ready) or n_workers != len(self.workers):
+            self.needs_rebuild = True
+        return not self.needs_rebuild
+
+    def mark_diverged(self) -> None:
+        self.needs_rebuild = True
+
+    # --- deltas -------------------------------------------------------------------------------
+
+    def upsert_repo(self, repo: str, *, max_open_prs: int, area_locks_enabled: bool) -> None:
+        rs = self.repos.get(repo)
+        if rs is None:
+            self.repos[repo] = RepoState(max_open_prs=max_open_prs, area_locks_enabled=area_locks_enabled)
+        else:
+            rs.max_open_prs = max_open_prs
+            rs.area_locks_enabled = area_locks_enabled
+        self._full_pass = True
+
+    def add_worker(self, worker: WorkerState) -> None:
+        worker.skill_mask = self.skills.mask(worker.skills)
+        self.workers[worker.worker_id] = worker
+        for signature, workers in self._candidates.items():
+            if signature & ~worker.skill_mask == 0:
+                workers.append(worker)
+
+    def worker_heartbeat(self, worker_id: str, *, status: str, at: datetime, ttl_seconds: int) -> None:
+        ws = self.workers.get(worker_id)
+        if ws is None:
+            self.mark_diverged()
+            return
+        if not ws.is_online(at, ttl_seconds) or ws.status != status:
+            # Came (back) online or changed pause state: any ready task may now fit.
+            self._full_pass = True
+        ws.status = status
+        ws.heartbeat_at = at
+        ws.last_heartbeat = db.to_iso(at)
+
+    def add_task(self, task: TaskState) -> None:
+        task.required_mask = self.skills.mask(task.required_skills)
+        self._insert_ready(task)
+        self._pending.add(task.task_id)
+
+    def lease(self, task_id: str, *, worker_id: str, lease_expires_at: datetime) -> None:
+        task = self._remove_ready(task_id)
+        if task is None:
+            self.mark_diverged()
+            return
+        ws = self.workers.get(worker_id)
+        if ws is not None:
+            ws.used_points += task.estimate_points
+            ws.used_tasks += 1
+        self._lease_changes.add(worker_id)
+        rs = self.repos.get(task.repo)
+        if rs is not None and task.area:
+            rs.locked_areas[task.area] += 1
+        if self.next_lease_expiry is None or lease_expires_at < self.next_lease_expiry:
+            self.next_lease_expiry = lease_expires_at
+
+    def task_status_changed(self, row: Mapping[str, Any], new_status: str) -> None:
+        """Applies a status change; `row` is the task as it was before the update."""
+        old_status = str(row["status"])
+        if old_status == new_status:
+            return
+        if old_status == "ready":
+            # Only the scheduler moves tasks out of ready; anything else means we missed a write.
+            self.mark_diverged()
+            return
+
+        repo = str(row["repo"])
+        points = int(row["estimate_points"])
+        area = (row["area"] or "").strip()
+        ws = self.workers.get(row["assigned_worker_id"] or "")
+        rs = self.repos.get(repo)
+        if row["assigned_worker_id"]:
+            self._lease_changes.add(str(row["assigned_worker_id"]))
+
+        if old_status in LOAD_STATUSES and new_status not in LOAD_STATUSES:
+            if ws is not None:
+                ws.used_points -= points
+                ws.used_tasks -= 1
+            if rs is not None and area:
+                rs.locked_areas[area] -= 1
+                if rs.locked_areas[area] <= 0:
+                    del rs.locked_areas[area]
+            self._full_pass = True
+        elif old_status not in LOAD_STATUSES and new_status in LOAD_STATUSES:
+            if ws is not None:
+                ws.used_points += points
+                ws.used_tasks += 1
+            if rs is not None and area:
+                rs.locked_areas[area] += 1
+            # The task is back under its old lease, which may already have run out.
+            expires = db.from_ms(row["lease_expires_ms"])
+            if expires is not None and (self.next_lease_expiry is None or expires < self.next_lease_expiry):
+                self.next_lease_expiry = expires
+
+        if rs is not None:
+            if old_status == "pr_opened":
+                rs.open_prs -= 1
+                self._full_pass = True
+            if new_status == "pr_opened":
+                rs.open_prs += 1
+
+    def requeued(self, rows: Iterable[Mapping[str, Any]], *, next_lease_expiry: datetime | None) -> None:
+        """Applies a bulk lease-expiry requeue; `rows` are the tasks as they were before it."""
+        for row in rows:
+            self.task_status_changed(row, "ready")
+            self.add_task(TaskState.from_row(row))
+        self.next_lease_expiry = next_lease_expiry
+
+    # --- queries ------------------------------------------------------------------------------
+
+    def lease_expiry_due(self, now: datetime) -> bool:
+        return self.next_lease_expiry is not None and self.next_lease_expiry < now
+
+    def take_pending(self) -> list[TaskState] | None:
+        """
+        Ready tasks worth considering this cycle, in priority order, or None when every ready task is
+        due (a full pass, served from the queues). Resets the change set.
+        """
+        if self._full_pass:
+            tasks = None
+        else:
+            tasks = sorted((self.ready[t] for t in self._pending if t in self.ready), key=lambda t: t.sort_key)
+        self._full_pass = False
+        self._pending.clear()
+        return tasks
+
+    def take_lease_changes(self) -> set[str]:
+        """Workers whose leases changed since the last call; resets the set."""
+        changed, self._lease_changes = self._lease_changes, set()
+        return changed
+
+    def candidates(self, required_mask: int) -> list[WorkerState]:
+        """Workers whose skills cover `required_mask`, cached per signature."""
+        workers = self._candidates.get(required_mask)
+        if workers is None:
+            workers = [ws for ws in self.workers.values() if required_mask & ~ws.skill_mask == 0]
+            self._candidates[required_mask] = workers
+        return workers
+
+    def ready_tasks(self, keys: Iterable[QueueKey] | None = None) -> Iterable[TaskState]:
+        """Ready tasks of the given queues (default: all), merged lazily into priority order."""
+        queues = self.queues.values() if keys is None else (self.queues[k] for k in keys)
+        return (self.ready[key[2]] for key in heapq.merge(*queues))
+
+    # --- internals ----------------------------------------------------------------------------
+
+    def _insert_ready(self, task: TaskState) -> None:
+        if task.task_id in self.ready:
+            return
+        self.ready[task.task_id] = task
+        key = task.queue_key
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = []
+            self.queues_by_mask.setdefault(task.required_mask, {}).setdefault(task.repo, set()).add(key)
+            self.queues_by_area.setdefault((task.repo, task.area), set()).add(key)
+        bisect.insort(queue, task.sort_key)
+        self.repo_ready[task.repo] += 1
+        self.area_ready[(task.repo, task.area)] += 1
+
+    def _remove_ready(self, task_id: str) -> TaskState | None:
+        task = self.ready.pop(task_id, None)
+        if task is None:
+            return None
+        key = task.queue_key
+        queue = self.queues[key]
+        sort_key = task.sort_key
+        i = bisect.bisect_left(queue, sort_key)
+        if i < len(queue) and queue[i] == sort_key:
+            del queue[i]
+        if not queue:
+            del self.queues[key]
+            by_repo = self.queues_by_mask[task.required_mask]
+            by_repo[task.repo].discard(key)
+            if not by_repo[task.repo]:
+                del by_repo[task.repo]
+                if not by_repo:
+                    del self.queues_by_mask[task.required_mask]
+            by_area = self.queues_by_area[(task.repo, task.area)]
+            by_area.discard(key)
+            if not by_area:
+                del self.queues_by_area[(task.repo, task.area)]
+        for counter, k in ((self.repo_ready, task.repo), (self.area_ready, (task.repo, task.area))):
+            counter[k] -= 1
+            if counter[k] <= 0:
+                del counter[k]
+        return task
@@ -0,0 +1,277 @@
+"""
+Many simulated workers on one asyncio event loop, for load-testing a pool server.
+
+Each simulated worker registers, then syncs (heartbeat + leases) on its heartbeat interval and
+long-polls `/v1/work` in between, and walks every lease it gets through in_progress → pr_opened
+(→ merged) with jittered delays. All workers share one `httpx.AsyncClient`, so thousands of them
+cost a coroutine each rather than a process or a thread. `pool worker swarm` is the CLI front end.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+
+@dataclass(frozen=True)
+class SwarmConfig:
+    count: int = 100
+    skills: tuple[str, ...] = ()
+    capacity_points: int = 5
+    max_concurrent_tasks: int = 2
+    heartbeat_every: float = 10.0
+    long_poll: bool = True
+    poll_every: float = 3.0  # only without long-poll
+    start_delay: float = 1.0  # lease received → in_progress
+    open_delay: float = 5.0  # in_progress → pr_opened
+    merge_delay: float = 5.0  # pr_opened → merged
+    merge_ratio: float = 1.0  # share of opened PRs that get merged
+    fail_ratio: float = 0.0  # share of tasks reported blocked instead of opening a PR
+    offline_ratio: float = 0.0  # chance per heartbeat that a worker drops off
+    offline_seconds: float = 120.0  # how long a dropped worker stays silent
+    register_concurrency: int = 50
+    timeout: float = 30.0
+    seed: int | None = None
+
+
+def jitter(rng: random.Random, seconds: float) -> float:
+    """Uniform in [0.5, 1.5] × seconds, so simulated workers do not move in lockstep."""
+    return seconds * rng.uniform(0.5, 1.5) if seconds > 0 else 0.0
+
+
+class SwarmStats:
+    """Request latencies per operation since the last `window()`, plus running totals."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.totals: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        self.counters: dict[str, int] = {
+            "workers": 0,
+            "offline": 0,
+            "leases": 0,
+            "pr_opened": 0,
+            "merged": 0,
+            "blocked": 0,
+        }
+        self._window: dict[str, list[float]] = {}
+        self._window_started = self.started
+
+    def record(self, op: str, seconds: float, ok: bool) -> None:
+        self._window.setdefault(op, []).append(seconds)
+        self.totals[op] = self.totals.get(op, 0) + 1
+        if not ok:
+            self.errors[op] = self.errors.get(op, 0) + 1
+
+    def bump(self, counter: str, n: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def window(self) -> tuple[float, dict[str, list[float]]]:
+        """(seconds covered, latencies per op) since the previous call; starts a new window."""
+        now = time.perf_counter()
+        elapsed, samples = now - self._window_started, self._window
+        self._window, self._window_started = {}, now
+        return elapsed, samples
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class SimulatedWorker:
+    def __init__(self, index: int, client: httpx.AsyncClient, config: SwarmConfig, stats: SwarmStats, rng: random.Random) -> None:
+        self.index = index
+        self.client = client
+        self.config = config
+        self.stats = stats
+        self.rng = rng
+        self.headers: dict[str, str] = {}
+        self.worker_id: str | None = None
+        self.version: int | None = None
+        self.active: dict[str, asyncio.Task[None]] = {}
+        # Leases already walked through to the end here. Sync and /v1/work keep returning blocked and
+        # pr_opened tasks, so they must not start another lifecycle.
+        self.processed: set[str] = set()
+
+    async def _call(self, op: str, method: str, path: str, **kwargs: Any) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            resp = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(op, time.perf_counter() - started, False)
+            return None
+        self.stats.record(op, time.perf_counter() - started, resp.status_code < 400)
+        return resp
+
+    async def register(self) -> bool:
+        body = {
+            "name": f"swarm-{self.index}",
+            "skills": list(self.config.skills),
+            "capacity_points": self.config.capacity_points,
+            "max_concurrent_tasks": self.config.max_concurrent_tasks,
+        }
+        resp = await self._call("register", "POST", "/v1/workers/register", json=body)
+        if resp is None or resp.status_code >= 400:
+            return False
+        data = resp.json()
+        self.worker_id = data["worker_id"]
+        self.headers = {"Authorization": f"Bearer {data['token']}"}
+        self.stats.bump("workers")
+        return True
+
+    async def run(self, stop: asyncio.Event) -> None:
+        cfg = self.config
+        # Spread the first syncs over one interval instead of hitting the server all at once.
+        await _sleep_or_stop(stop, self.rng.uniform(0, cfg.heartbeat_every))
+        while not stop.is_set():
+            if cfg.offline_ratio and self.rng.random() < cfg.offline_ratio:
+                await self._go_offline(stop)
+                continue
+            await self._sync()
+            next_sync = time.monotonic() + jitter(self.rng, cfg.heartbeat_every)
+            while not stop.is_set() and (remaining := next_sync - time.monotonic()) > 0:
+                if cfg.long_poll and self.version is not None:
+                    await self._long_poll(stop, remaining)
+                else:
+                    await _sleep_or_stop(stop, min(remaining, cfg.poll_every))
+                    if time.monotonic() < next_sync:
+                        await self._poll()
+        await self._drop_active()
+
+    async def _go_offline(self, stop: asyncio.Event) -> None:
+        # Silent: no heartbeats, no status updates; leases in flight stall until the server requeues them.
+        self.stats.bump("offline")
+        await self._drop_active()
+        await _sleep_or_stop(stop, jitter(self.rng, self.config.offline_seconds))
+        self.stats.bump("offline", -1)
+
+    async def _drop_active(self) -> None:
+        tasks = list(self.active.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.active.clear()
+
+    async def _sync(self) -> None:
+        status = "working" if self.active else "idle"
+        resp = await self._call("sync", "POST", "/v1/workers/sync", json={"status": status}, headers=self.headers)
+        if resp is not None and resp.status_code < 400:
+            self._absorb(resp.json())
+
+    async def _poll(self) -> None:
+        resp = await self._call("work", "GET", "/v1/work", headers=self.headers)
+        if resp is not None and resp.status_code < 400:
+            self._absorb(resp.json())
+
+    async def _long_poll(self, stop: asyncio.Event, remaining: float) -> None:
+        wait = max(1, min(60, int(remaining)))
+        params = {"wait": wait, "since": self.version}
+        request = asyncio.ensure_future(
+            self._call("long_poll", "GET", "/v1/work", params=params, headers=self.headers, timeout=wait + self.config.timeout)
+        )
+        stopping = asyncio.ensure_future(stop.wait())
+        done, _ = await asyncio.wait({request, stopping}, return_when=asyncio.FIRST_COMPLETED)
+        if request not in done:
+            request.cancel()
+        stopping.cancel()
+        if request in done:
+            resp = request.result()
+            if resp is not None and resp.status_code < 400:
+                self._absorb(resp.json())
+
+    def _absorb(self, data: dict[str, Any]) -> None:
+        self.version = data.get("version", self.version)
+        for lease in data.get("leases", ()):
+            task_id = lease["task_id"]
+            if task_id not in self.active and task_id not in self.processed:
+                self.stats.bump("leases")
+                self.active[task_id] = asyncio.ensure_future(self._work_on(task_id))
+
+    async def _status(self, task_id: str, status: str, **extra: Any) -> bool:
+        resp = await self._call("status", "POST", f"/v1/tasks/{task_id}/status", json={"status": status, **extra}, headers=self.headers)
+        return resp is not None and resp.status_code < 400
+
+    async def _work_on(self, task_id: str) -> None:
+        try:
+            await self._lifecycle(task_id)
+            # Not reached when cancelled (worker went offline): a lease it still holds is resumed later.
+            self.processed.add(task_id)
+        finally:
+            self.active.pop(task_id, None)
+
+    async def _lifecycle(self, task_id: str) -> None:
+        cfg = self.config
+        await asyncio.sleep(jitter(self.rng, cfg.start_delay))
+        if not await self._status(task_id, "in_progress", message="swarm: started"):
+            return
+        await asyncio.sleep(jitter(self.rng, cfg.open_delay))
+        if cfg.fail_ratio and self.rng.random() < cfg.fail_ratio:
+            if await self._status(task_id, "blocked", message="swarm: injected failure"):
+                self.stats.bump("blocked")
+            return
+        artifact = {"pr_url": f"https://example.invalid/pr/{task_id}"}
+        if not await self._status(task_id, "pr_opened", message="swarm: PR opened", artifact=artifact):
+            return
+        self.stats.bump("pr_opened")
+        if self.rng.random() < cfg.merge_ratio:
+            await asyncio.sleep(jitter(self.rng, cfg.merge_delay))
+            if await self._status(task_id, "merged", message="swarm: merged", artifact=artifact):
+                self.stats.bump("merged")
+
+
+async def _sleep_or_stop(stop: asyncio.Event, seconds: float) -> None:
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=max(0.0, seconds))
+    except asyncio.TimeoutError:
+        pass
+
+
+async def run_swarm(
+    base_url: str,
+    config: SwarmConfig,
+    *,
+    duration: float | None = None,
+    on_tick: Callable[[SwarmStats], Awaitable[None] | None] | None = None,
+    tick_seconds: float = 1.0,
+    stop: asyncio.Event | None = None,
+) -> SwarmStats:
+    """Registers `config.count` workers and drives them until `duration` elapses or `stop` is set."""
+    stats = SwarmStats()
+    stop = stop or asyncio.Event()
+    rng = random.Random(config.seed)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=min(config.count, 1000))
+    async with httpx.AsyncClient(base_url=base_url, timeout=config.timeout, limits=limits) as client:
+        workers = [SimulatedWorker(i, client, config, stats, random.Random(rng.random())) for i in range(config.count)]
+
+        gate = asyncio.Semaphore(config.register_concurrency)
+
+        async def register(worker: SimulatedWorker) -> bool:
+            async with gate:
+                return await worker.register()
+
+        registered = await asyncio.gather(*(register(w) for w in workers))
+        workers = [w for w, ok in zip(workers, registered) if ok]
+
+        async def ticker() -> None:
+            while not stop.is_set():
+                await _sleep_or_stop(stop, tick_seconds)
+                if on_tick is not None:
+                    result = on_tick(stats)
+                    if asyncio.iscoroutine(result):
+                        await result
+
+        async def timer() -> None:
+            if duration:
+                await _sleep_or_stop(stop, duration)
+                stop.set()
+
+        await asyncio.gather(ticker(), timer(), *(w.run(stop) for w in workers))
+    return stats
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulingTrigger:
+    """
+    Coalesces scheduling requests into as few cycles as possible.
+
+    Request handlers call `request()` to mark the pool dirty; a single background thread wakes up,
+    waits `debounce_seconds` so a burst of requests shares one cycle, then runs it. The thread also
+    runs a cycle every `interval_seconds` when nothing asked for one (lease expiry, offline workers).
+
+    Each request returns a generation number; `wait(generation, timeout)` blocks until a cycle that
+    started after that request has finished, and `wait_async` awaits the same on an event loop.
+    Without a running thread, `request()` runs the cycle inline so the service still works when
+    driven directly.
+    """
+
+    def __init__(
+        self,
+        run_cycle: Callable[[], Any],
+        *,
+        interval_seconds: float = 5.0,
+        debounce_seconds: float = 0.05,
+    ) -> None:
+        self._run_cycle = run_cycle
+        self.interval_seconds = interval_seconds
+        self.debounce_seconds = debounce_seconds
+        self._cond = threading.Condition()
+        self._requested = 0
+        self._completed = 0
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+        self._waiters: list[tuple[int, asyncio.AbstractEventLoop, asyncio.Future[int]]] = []
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        with self._cond:
+            self._stopping = False
+        self._thread = threading.Thread(target=self._loop, name="pool-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 5.0) -> None:
+        thread = self._thread
+        if thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            self._wake_waiters()
+        thread.join(timeout)
+        self._thread = None
+
+    def request(self) -> int:
+        """Marks the pool dirty and returns the generation a later `wait()` can wait for."""
+        if not self.running:
+            self._run_cycle()
+            with self._cond:
+                self._requested += 1
+                self._completed = self._requested
+                self._wake_waiters()
+                return self._requested
+        with self._cond:
+            self._requested += 1
+            self._cond.notify_all()
+            return self._requested
+
+    def wait(self, generation: int, timeout: float) -> bool:
+        """Waits up to `timeout` seconds for a cycle covering `generation`; True if one finished."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._completed >= generation or self._stopping, timeout)
+
+    async def wait_async(self, generation: int, timeout: float) -> bool:
+        """Like `wait()`, but parks a future on the running event loop instead of blocking a thread."""
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self._completed >= generation or self._stopping:
+                return True
+            fut: asyncio.Future[int] = loop.create_future()
+            entry = (generation, loop, fut)
+            self._waiters.append(entry)
+        try:
+            await asyncio.wait_for(fut, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._cond:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+
+    def _wake_waiters(self) -> None:
+        # Called with self._cond held.
+        ready = [w for w in self._waiters if w[0] <= self._completed or self._stopping]
+        if not ready:
+            return
+        self._waiters = [w for w in self._waiters if w not in ready]
+        for _, loop, fut in ready:
+            _notify(loop, fut, self._completed)
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping or self._requested > self._completed, self.interval_seconds)
+                if self._stopping:
+                    return
+                if self._requested > self._completed and self.debounce_seconds > 0:
+                    # Let the rest of a burst arrive before running the shared cycle.
+                    self._cond.wait_for(lambda: self._stopping, self.debounce_seconds)
+                    if self._stopping:
+                        return
+                generation = self._requested
+
+            try:
+                self._run_cycle()
+            except Exception:
+                logger.exception("scheduling cycle failed")
+
+            with self._cond:
+                self._completed = max(self._completed, generation)
+                self._cond.notify_all()
+                self._wake_waiters()
+
+
+class LeaseNotifier:
+    """
+    Per-worker lease-set versions with async waiters, for long-polling `/v1/work`.
+
+    The writer side calls `bump()` (from any thread) when a worker's leases change; request handlers
+    `await wait()` on the event loop until that worker's version passes the one the client already has.
+    Waiting parks a future, not a thread. Versions come from one counter seeded with wall-clock
+    milliseconds, so they keep increasing across restarts and a stale `since` returns immediately.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._seq = time.time_ns() // 1_000_000
+        self._base = self._seq
+        self._versions: dict[str, int] = {}
+        self._waiters: dict[str, list[tuple[asyncio.AbstractEventLoop, asyncio.Future[int]]]] = {}
+
+    def version(self, worker_id: str) -> int:
+        with self._lock:
+            return self._versions.get(worker_id, self._base)
+
+    def bump(self, worker_ids: Iterable[str]) -> None:
+        woken: list[tuple[asyncio.AbstractEventLoop, asyncio.Future[int], int]] = []
+        with self._lock:
+            for worker_id in set(worker_ids):
+                self._seq += 1
+                self._versions[worker_id] = self._seq
+                for loop, fut in self._waiters.pop(worker_id, ()):
+                    woken.append((loop, fut, self._seq))
+        for loop, fut, version in woken:
+            _notify(loop, fut, version)
+
+    async def wait(self, worker_id: str, since: int, timeout: float) -> int:
+        """Returns the worker's version once it is newer than `since`, or the current one on timeout."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            current = self._versions.get(worker_id, self._base)
+            if current > since:
+                return current
+            fut: asyncio.Future[int] = loop.create_future()
+            self._waiters.setdefault(worker_id, []).append((loop, fut))
+        try:
+            return await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            return self.version(worker_id)
+        finally:
+            with self._lock:
+                entries = self._waiters.get(worker_id)
+                if entries:
+                    entries[:] = [(l, f) for l, f in entries if f is not fut]
+                    if not entries:
+                        del self._waiters[worker_id]
+
+
+def _resolve(fut: asyncio.Future[int], version: int) -> None:
+    if not fut.done():
+        fut.set_result(version)
+
+
+def _notify(loop: asyncio.AbstractEventLoop, fut: asyncio.Future[int], version: int) -> None:
+    try:
+        loop.call_soon_threadsafe(_resolve, fut, version)
+    except RuntimeError:
+        # The waiter's loop is closed; nobody is left to wake.
+        pass
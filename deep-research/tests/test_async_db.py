@@ -0,0 +1,41 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from pool import db
+from pool.models import RegisterWorkerRequest
+from pool.scheduler import SchedulerConfig
+from pool.server import PoolService
+
+
+def test_failed_batch_commit_marks_state_diverged(tmp_path):
+    """A write batch whose COMMIT fails must not leave its state deltas behind unnoticed."""
+    service = PoolService(str(tmp_path / "pool.db"), scheduler_config=SchedulerConfig())
+    service.run_cycle()
+    assert not service._state.needs_rebuild
+
+    def job(conn):
+        # Defer FK checks so the dangling task only fails at COMMIT, after the worker delta is applied.
+        conn.execute("PRAGMA defer_foreign_keys = ON")
+        service._register_worker(conn, "w_ghost", "hash", RegisterWorkerRequest(name="ghost"))
+        db.insert_task(
+            conn, task_id="t_ghost", repo="missing", title="x", description=None, estimate_points=1,
+            priority=0, required_skills=[], area=None, tier=0,
+        )
+
+    async def main():
+        service.db.start()
+        try:
+            await service.db.write(job)
+        finally:
+            service.db.stop()
+
+    try:
+        with pytest.raises(sqlite3.IntegrityError):
+            asyncio.run(main())
+        assert service._state.needs_rebuild
+        service.run_cycle()
+        assert "w_ghost" not in service._state.workers
+    finally:
+        service.stop()
@@ -0,0 +1,36 @@
+import time
+
+from pool import db
+from pool.models import HeartbeatRequest, RegisterWorkerRequest, TaskCreateRequest, TaskStatusUpdateRequest
+from pool.scheduler import SchedulerConfig, run_scheduling_cycle
+from pool.server import PoolService
+
+
+def test_lease_resumed_after_expiry_is_requeued(tmp_path):
+    """blocked -> in_progress brings back an expired lease; the warm cycle must requeue it like a cold one."""
+    path = str(tmp_path / "pool.db")
+    config = SchedulerConfig(lease_ttl_seconds=1)
+    service = PoolService(path, scheduler_config=config)
+    try:
+        service.create_repo("demo", 3, False)
+        worker_id = service.register_worker(RegisterWorkerRequest(name="w")).worker_id
+        service.heartbeat(worker_id, HeartbeatRequest())
+        task_id = service.add_task(TaskCreateRequest(repo="demo", title="t")).task_id
+        assert service.run_cycle()["assigned"] == 1
+
+        service.update_task_status(worker_id=worker_id, task_id=task_id, req=TaskStatusUpdateRequest(status="blocked"))
+        time.sleep(1.1)
+        service.run_cycle()  # nothing to requeue: the only lease is blocked
+        service.update_task_status(worker_id=worker_id, task_id=task_id, req=TaskStatusUpdateRequest(status="in_progress"))
+
+        cold = db.connect(":memory:")
+        db.connect(path).backup(cold)
+        expected = run_scheduling_cycle(cold, config=config)["requeued"]
+
+        assert expected == 1
+        assert service.run_cycle()["requeued"] == expected
+        # Requeued and leased again in the same cycle, under a fresh lease.
+        expires_ms = db.connect(path).execute("SELECT lease_expires_ms FROM tasks WHERE task_id=?", (task_id,)).fetchone()[0]
+        assert expires_ms > db.to_ms(db.utc_now())
+    finally:
+        service.stop()